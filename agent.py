@@ -1,17 +1,47 @@
 import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
 
 # Import our tools and database functions
 from tools import tools
-from database import medication_exists, get_medication_availability, get_medication_profile, check_user_prescription
+from database import medication_exists, get_medication_availability, get_medication_profile, check_user_prescription, get_branch_availability, find_equivalent_medications
+import audit
+import catalog
+import prefetch
+import recorder
+import routing
+import shaping
+from llm_client import ResilientLLMClient, LLMUnavailableError
 
-# Load environment variables from .env file
-load_dotenv()
+# OpenAI client - created on first use so importing this module stays fast
+_client = None
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def get_client():
+    """
+    Return the shared LLM client, creating it on first use.
+
+    Loads .env and imports the OpenAI SDK lazily - both are slow and only
+    needed once the first message is sent.
+
+    Returns:
+        ResilientLLMClient: OpenAI client wrapped with deadlines, retries, hedging and circuit breaker
+    """
+    global _client
+
+    if _client is None:
+        from openai import OpenAI
+        from dotenv import load_dotenv
+
+        # Load environment variables from .env file
+        load_dotenv()
+        _client = ResilientLLMClient(OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0))
+
+    return _client
+
+
+# Maximum time for one run_agent turn, across all model calls
+TURN_DEADLINE_SECONDS = float(os.getenv("PHARMACY_LLM_DEADLINE", "60"))
 
 # System prompt - defines the agent's role and behavior
 SYSTEM_PROMPT = """You are a helpful pharmacy assistant for a retail pharmacy chain.
@@ -47,6 +77,10 @@ Tool usage workflow:
    - AVAILABILITY/STOCK questions → use get_medication_availability
    - PRICE questions → use get_medication_availability  
    - DOSAGE/USAGE/INGREDIENTS questions → use get_medication_profile
+   - WHICH BRANCH / NEAREST STORE questions → use get_branch_availability (pass branch_name if the user names a branch or city)
+   - EQUIVALENT / ALTERNATIVE questions (e.g. when out of stock) → use find_equivalent_medications
+     List the same-ingredient alternatives factually - never recommend one
+   - Pass "fields" with only what the question needs (e.g. ["price"] or ["dosage_instructions"])
 
 3. Answer ONLY what was asked - don't volunteer extra information
    - If asked about price - provide price only (not stock status)
@@ -59,6 +93,9 @@ def execute_tool_call(tool_name, arguments, verified_user):
     """
     Execute the actual function based on the tool name.
 
+    Every call (and every prescription access decision) is written to the
+    audit log in the background.
+
     Args:
         tool_name (str): Name of the tool to execute
         arguments (dict): Arguments to pass to the function
@@ -67,25 +104,53 @@ def execute_tool_call(tool_name, arguments, verified_user):
     Returns:
         dict: Result from the function
     """
+    # User's ID number for prescription check
+    id_number = verified_user["id_number"] if verified_user else None
+
+    result = _dispatch_tool_call(tool_name, arguments, id_number)
+    audit.log_tool_call(tool_name, arguments, id_number, result)
+
+    return result
+
+
+def _dispatch_tool_call(tool_name, arguments, id_number):
+    """Call the database function behind a tool."""
     if tool_name == "medication_exists":
         medication_name = arguments.get("medication_name")
-        return medication_exists(medication_name)
+        # Precomputed name index first, database for anything it doesn't know
+        result = catalog.find_medication(medication_name) or medication_exists(medication_name)
+
+        # Warm the likely follow-up calls in the background
+        if result.get("found"):
+            prefetch.schedule_followups(result["medication"]["id"], id_number)
+
+        return result
 
     elif tool_name == "get_medication_availability":
         medication_id = arguments.get("medication_id")
-        return get_medication_availability(medication_id)
+        cached = prefetch.take(tool_name, medication_id)
+        return cached if cached is not None else get_medication_availability(medication_id)
 
     elif tool_name == "get_medication_profile":
         medication_id = arguments.get("medication_id")
-        # Pass user's ID number for prescription check
-        id_number = verified_user["id_number"] if verified_user else None
-        return get_medication_profile(medication_id, id_number)
+        cached = prefetch.take(tool_name, medication_id, id_number)
+        return cached if cached is not None else get_medication_profile(medication_id, id_number)
+
+    elif tool_name == "get_branch_availability":
+        medication_id = arguments.get("medication_id")
+        branch_name = arguments.get("branch_name")
+        limit = arguments.get("limit") or 5
+        return get_branch_availability(medication_id, branch_name, limit)
+
+    elif tool_name == "find_equivalent_medications":
+        medication_id = arguments.get("medication_id")
+        return find_equivalent_medications(medication_id)
 
     else:
         return {"error": f"Unknown tool: {tool_name}"}
 
 
-def run_agent(user_message, verified_user, conversation_history=[]):
+def run_agent(user_message, verified_user, conversation_history=[], llm=None):
     """
     Main agent function - handles the conversation flow with tool calling.
 
@@ -93,6 +158,8 @@ def run_agent(user_message, verified_user, conversation_history=[]):
         user_message (str): The user's message
         verified_user (dict): Current verified user information
         conversation_history (list): Previous conversation messages
+        llm (optional): Client with a create(deadline=..., **kwargs) method
+                        (defaults to get_client(); replay.py passes a scripted model)
 
     Returns:
         tuple: (response, updated_history, tool_calls_info)
@@ -100,6 +167,17 @@ def run_agent(user_message, verified_user, conversation_history=[]):
             - updated_history (list): Updated conversation messages
             - tool_calls_info (list): Tool calls made during conversation
     """
+    # Record the turn for offline replay (no-op unless PHARMACY_RECORD_DIR is set)
+    session = recorder.start_session(user_message, verified_user, conversation_history)
+
+    result = _run_turn(user_message, verified_user, conversation_history, llm or get_client(), session)
+
+    recorder.finish_session(session, result[0])
+    return result
+
+
+def _run_turn(user_message, verified_user, conversation_history, llm, session):
+    """Run the tool-calling loop for one user message (see run_agent)."""
 
     # Build system message with user context
     system_message = SYSTEM_PROMPT
@@ -117,17 +195,32 @@ def run_agent(user_message, verified_user, conversation_history=[]):
     # Main loop - allows multiple tool calls
     max_iterations = 5  # Prevent infinite loops
     iteration = 0
+    deadline = time.monotonic() + TURN_DEADLINE_SECONDS
 
     while iteration < max_iterations:
         iteration += 1
 
+        # Pick small model for simple lookups, large model for everything else
+        route = routing.choose_route(messages)
+
         # Send request to OpenAI
-        response = client.chat.completions.create(
-            model="gpt-5",  # Use GPT-5 for better function calling
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"  # Let GPT decide when to use tools
-        )
+        start_time = time.perf_counter()
+        try:
+            response = llm.create(
+                deadline=deadline,
+                model=route["model"],
+                messages=messages,
+                tools=tools,
+                tool_choice="auto"  # Let GPT decide when to use tools
+            )
+        except LLMUnavailableError:
+            # Provider is slow or failing - answer gracefully instead of crashing the UI
+            tool_calls_info = extract_tool_calls_from_messages(messages)
+            return "The assistant is temporarily unavailable. Please try again in a moment.", messages, tool_calls_info
+
+        latency = time.perf_counter() - start_time
+        routing.record_call(route["route"], route["model"], latency, getattr(response, "usage", None))
+        recorder.record_model_response(session, route["model"], latency, response)
 
         # Get the assistant's message
         assistant_message = response.choices[0].message
@@ -148,12 +241,18 @@ def run_agent(user_message, verified_user, conversation_history=[]):
             # Execute the actual function
             tool_result = execute_tool_call(tool_name, tool_arguments, verified_user)
 
+            # Only the requested fields, without nulls, compactly encoded
+            content = shaping.encode_result(
+                shaping.shape_result(tool_name, tool_result, tool_arguments.get("fields"))
+            )
+            recorder.record_tool_call(session, tool_name, tool_arguments, content)
+
             # Add tool result to conversation
             messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
                 "name": tool_name,
-                "content": json.dumps(tool_result)
+                "content": content
             })
 
     # If we exhausted max iterations without getting a final answer
@@ -1,6 +1,46 @@
+import math
+import uuid
+
 import streamlit as st
+from dotenv import load_dotenv
+
+# PHARMACY_* settings are read when the project modules are imported, so .env must be loaded first
+load_dotenv()
+
 from database import verify_user
-from agent import run_agent
+from agent import run_agent, get_client
+from ratelimit import RateLimiter, SingleFlight
+import catalog
+
+
+@st.cache_resource
+def warm_up():
+    """Load the catalog snapshot and create the OpenAI client once per process."""
+    get_client()
+    return catalog.load_snapshot()
+
+
+@st.cache_resource
+def get_admission_control():
+    """Rate limiter and request coalescing, shared by all sessions in this process."""
+    return RateLimiter(), SingleFlight()
+
+
+def answer_message(user_message, user, history):
+    """Run the agent if the user is within their rate limit."""
+    rate_limiter, _ = get_admission_control()
+    allowed, retry_after = rate_limiter.check(user["id_number"])
+
+    if not allowed:
+        seconds = math.ceil(retry_after)
+        response = (
+            f"שלחת הרבה הודעות. אנא נסה שוב בעוד {seconds} שניות.\n\n"
+            f"You're sending messages too quickly. Please try again in {seconds} seconds."
+        )
+        return response, history, []
+
+    return run_agent(user_message, user, history)
+
 
 # Change button hover - border and text only
 st.markdown("""
@@ -60,7 +100,8 @@ else:
         "history": [],
         "confirm_new_chat": False,
         "processing": False,
-        "current_input": None
+        "current_input": None,
+        "submission_id": None
     }
 
     for key, value in defaults.items():
@@ -124,6 +165,7 @@ else:
         # Mark that we're processing
         st.session_state.processing = True
         st.session_state.current_input = user_input  # Save for processing
+        st.session_state.submission_id = uuid.uuid4().hex  # Identifies this message across reruns
 
         # First rerun - will display user message immediately
         st.rerun()
@@ -133,7 +175,12 @@ else:
         # User message is already displayed!
         # Show thinking spinner
         with st.spinner("🤖 Thinking..."):
-            response, updated_history, tool_calls = run_agent(
+            # One agent execution per submission: a rerun that interrupted this
+            # block before processing was cleared reuses the completed result
+            _, single_flight = get_admission_control()
+            (response, updated_history, tool_calls), _ = single_flight.do(
+                st.session_state.submission_id,
+                answer_message,
                 st.session_state.current_input,
                 st.session_state.user,
                 st.session_state.history
@@ -152,6 +199,10 @@ else:
         # Done processing
         st.session_state.processing = False
         st.session_state.current_input = None
+        st.session_state.submission_id = None
 
         # Second rerun - will display bot response
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+# Warm up after the page is drawn, so the first render is not delayed
+warm_up()
@@ -0,0 +1,396 @@
+"""
+Audit log for tool calls and prescription access decisions.
+
+Events are put on an in-memory queue and written by a background thread in
+batches, so the request path only pays for a non-blocking queue put:
+- The queue is bounded (AUDIT_QUEUE_MAX); when it is full, tool_call events
+  are dropped and counted instead of blocking the user's request
+- access_decision events are never dropped: the last AUDIT_RESERVED_CAPACITY
+  slots are kept for them, a full queue blocks for up to
+  AUDIT_CRITICAL_PUT_TIMEOUT, and after that the event is written synchronously
+- The writer batch-inserts up to AUDIT_BATCH_SIZE events per transaction. A
+  failed write (e.g. "database is locked") is retried with backoff; if it
+  still fails, access_decision events are kept and retried with the next
+  batch, and the other events are dropped and counted
+- audit_log is append-only (UPDATE and DELETE are rejected by triggers)
+- Pending events are flushed at interpreter shutdown
+
+Run `python audit.py` to measure the enqueue cost on the request path.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+AUDIT_DB_PATH = 'pharmacy.db'
+
+# Disable with PHARMACY_AUDIT=0 (replay.py disables it so replays don't pollute the log)
+AUDIT_ENABLED = os.getenv("PHARMACY_AUDIT", "1") != "0"
+
+# Backpressure: maximum events waiting to be written
+AUDIT_QUEUE_MAX = 10000
+
+# Queue slots only access_decision events may use
+AUDIT_RESERVED_CAPACITY = 1000
+
+# Events that must never be dropped
+CRITICAL_EVENT_TYPES = {"access_decision"}
+
+# Longest a critical event waits for queue space before it is written synchronously (seconds)
+AUDIT_CRITICAL_PUT_TIMEOUT = 1.0
+
+# Maximum events per INSERT transaction
+AUDIT_BATCH_SIZE = 200
+
+# Longest an event waits before its batch is written (seconds)
+AUDIT_FLUSH_INTERVAL = 0.5
+
+# Retries of a failed batch write, with exponential backoff from AUDIT_RETRY_BACKOFF seconds
+AUDIT_WRITE_RETRIES = 3
+AUDIT_RETRY_BACKOFF = 0.1
+
+_queue = queue.Queue(maxsize=AUDIT_QUEUE_MAX)
+_writer = None
+_writer_lock = threading.Lock()
+_stats_lock = threading.Lock()
+
+_stats = {
+    "enqueued": 0,  # Events accepted on the request path
+    "dropped": 0,   # Events rejected (queue full) or lost to failed writes - never access_decision
+    "written": 0,   # Events committed to audit_log
+    "sync_writes": 0,  # Critical events written on the request path because the queue stayed full
+    "batches": 0,   # INSERT transactions
+    "errors": 0     # Failed write attempts
+}
+
+# Sentinel that tells the writer to stop
+_STOP = object()
+
+
+def create_audit_table(cursor):
+    """
+    Create the append-only audit_log table if it does not exist.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on the target database
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            id_number TEXT,
+            tool_name TEXT,
+            medication_id INTEGER,
+            decision TEXT,
+            details TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log (id_number, created_at)')
+
+    # Append-only: reject any change to existing rows
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS audit_log_no_update
+        BEFORE UPDATE ON audit_log
+        BEGIN
+            SELECT RAISE(ABORT, 'audit_log is append-only');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS audit_log_no_delete
+        BEFORE DELETE ON audit_log
+        BEGIN
+            SELECT RAISE(ABORT, 'audit_log is append-only');
+        END
+    ''')
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _connect():
+    """Open the audit database and make sure audit_log exists."""
+    conn = sqlite3.connect(AUDIT_DB_PATH)
+    create_audit_table(conn.cursor())
+    conn.commit()
+    return conn
+
+
+def _write_batch(conn, batch):
+    """
+    Insert a batch of events in one transaction, retrying with backoff.
+
+    Returns:
+        bool: True if the batch was written
+    """
+    for attempt in range(AUDIT_WRITE_RETRIES + 1):
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO audit_log
+                    (created_at, event_type, id_number, tool_name, medication_id, decision, details)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+            _count("written", len(batch))
+            _count("batches")
+            return True
+        except sqlite3.Error:
+            _count("errors")
+            if attempt < AUDIT_WRITE_RETRIES:
+                time.sleep(AUDIT_RETRY_BACKOFF * 2 ** attempt)
+
+    return False
+
+
+def _write_now(event):
+    """
+    Write one event synchronously on the caller's thread (fallback for critical events).
+
+    Returns:
+        bool: True if the event was written
+    """
+    conn = _connect()
+    try:
+        written = _write_batch(conn, [event])
+    finally:
+        conn.close()
+    _count("sync_writes")
+    return written
+
+
+def _writer_loop():
+    """Background writer: drain the queue and batch-insert into audit_log."""
+    conn = _connect()
+
+    # Critical events from a failed batch, retried with the next one. Their
+    # task_done() is only called once they are written, so flush() waits for them.
+    carry = []
+    stopping = False
+    while not stopping:
+        batch = list(carry)
+
+        # Wait for the first event, then take whatever else is already queued
+        try:
+            event = _queue.get(timeout=AUDIT_FLUSH_INTERVAL)
+        except queue.Empty:
+            event = None
+            if not batch:
+                continue
+
+        while event is not None:
+            if event is _STOP:
+                stopping = True
+            else:
+                batch.append(event)
+
+            if stopping or len(batch) >= AUDIT_BATCH_SIZE:
+                break
+            try:
+                event = _queue.get_nowait()
+            except queue.Empty:
+                break
+
+        carry = []
+        if batch and not _write_batch(conn, batch):
+            carry = [e for e in batch if e[1] in CRITICAL_EVENT_TYPES]
+            _count("dropped", len(batch) - len(carry))
+
+            # Last chance before the writer exits
+            if stopping and carry and _write_batch(conn, carry):
+                carry = []
+
+        for _ in range(len(batch) - len(carry) + (1 if stopping else 0)):
+            _queue.task_done()
+
+    conn.close()
+
+
+def _ensure_writer():
+    """Start the background writer on first use."""
+    global _writer
+
+    if _writer is not None and _writer.is_alive():
+        return
+
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="audit-writer", daemon=True)
+            _writer.start()
+
+
+def log_event(event_type, id_number=None, tool_name=None, medication_id=None, decision=None, details=None):
+    """
+    Queue an audit event.
+
+    tool_call events never block and are dropped when the queue is full.
+    access_decision events may use the reserved capacity, wait briefly for
+    space, and are written synchronously as a last resort.
+
+    Args:
+        event_type (str): "tool_call" or "access_decision"
+        id_number (str, optional): User's ID number
+        tool_name (str, optional): Tool that was called
+        medication_id (int, optional): Medication involved
+        decision (str, optional): Access decision ("granted", "denied", "not_required")
+        details (dict, optional): Extra data, stored as JSON
+
+    Returns:
+        bool: True if the event was queued or written, False if it was dropped (or auditing is disabled)
+    """
+    if not AUDIT_ENABLED:
+        return False
+
+    _ensure_writer()
+
+    event = (
+        datetime.now(timezone.utc).isoformat(),
+        event_type,
+        id_number,
+        tool_name,
+        medication_id,
+        decision,
+        json.dumps(details, ensure_ascii=False, separators=(",", ":")) if details is not None else None
+    )
+
+    if event_type in CRITICAL_EVENT_TYPES:
+        try:
+            _queue.put(event, timeout=AUDIT_CRITICAL_PUT_TIMEOUT)
+        except queue.Full:
+            return _write_now(event)
+    else:
+        # Leave the reserved slots to critical events
+        if _queue.qsize() >= AUDIT_QUEUE_MAX - AUDIT_RESERVED_CAPACITY:
+            _count("dropped")
+            return False
+        try:
+            _queue.put_nowait(event)
+        except queue.Full:
+            _count("dropped")
+            return False
+
+    _count("enqueued")
+    return True
+
+
+def access_decision(profile_result):
+    """
+    Classify a get_medication_profile result as an access decision.
+
+    Args:
+        profile_result (dict): Result of get_medication_profile
+
+    Returns:
+        str: "granted", "denied" or "not_required" (None if the medication was not found)
+    """
+    if not profile_result.get("found"):
+        return None
+    if not profile_result.get("requires_prescription"):
+        return "not_required"
+    return "granted" if profile_result.get("can_access") else "denied"
+
+
+def log_tool_call(tool_name, arguments, id_number, result):
+    """
+    Audit a tool call, plus the access decision for get_medication_profile.
+
+    Args:
+        tool_name (str): Tool that was called
+        arguments (dict): Tool arguments
+        id_number (str): User's ID number
+        result (dict): Tool result
+    """
+    medication_id = arguments.get("medication_id")
+
+    log_event("tool_call", id_number, tool_name, medication_id, details={
+        "arguments": arguments,
+        "found": result.get("found"),
+        "error": result.get("error")
+    })
+
+    if tool_name == "get_medication_profile":
+        decision = access_decision(result)
+        if decision is not None:
+            log_event("access_decision", id_number, tool_name, medication_id, decision)
+
+
+def flush(timeout=5.0):
+    """
+    Wait until every queued event has been written.
+
+    Args:
+        timeout (float): Maximum seconds to wait
+
+    Returns:
+        bool: True if the queue was drained in time
+    """
+    if _writer is None or not _writer.is_alive():
+        return _queue.empty()
+
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return _queue.unfinished_tasks == 0
+
+
+def shutdown(timeout=5.0):
+    """Flush pending events and stop the writer (registered with atexit)."""
+    global _writer
+
+    if _writer is None or not _writer.is_alive():
+        return
+
+    # The stop sentinel waits behind pending events, so they are written first
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        return
+    _writer.join(timeout)
+    _writer = None
+
+
+atexit.register(shutdown)
+
+
+def get_audit_stats():
+    """
+    Report audit pipeline counters.
+
+    Returns:
+        dict: {"enqueued", "dropped", "written", "sync_writes", "batches", "errors", "queue_size"}
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queue_size"] = _queue.qsize()
+    return stats
+
+
+# Measure the request-path cost of auditing
+if __name__ == "__main__":
+    import tempfile
+
+    # Write to a scratch database - audit_log rows can never be deleted
+    AUDIT_DB_PATH = os.path.join(tempfile.mkdtemp(), "audit_benchmark.db")
+    events = 4000
+
+    start = time.perf_counter()
+    for i in range(events):
+        log_tool_call("get_medication_profile", {"medication_id": 3}, "234567890",
+                      {"found": True, "requires_prescription": True, "can_access": False})
+    enqueue_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    flush()
+    flush_seconds = time.perf_counter() - start
+
+    stats = get_audit_stats()
+    print(f"Audited {events} tool calls ({stats['enqueued'] + stats['dropped']} events)")
+    print(f"Request path: {enqueue_seconds / events * 1e6:.1f} us per tool call")
+    print(f"Background writer drained the queue in {flush_seconds:.3f}s ({AUDIT_DB_PATH})")
+    print(f"Stats: {stats}")
@@ -0,0 +1,126 @@
+"""
+Benchmark tool result encoding size.
+
+Runs every tool over the seeded catalog and test users and compares the
+prompt tokens of the original encoding (json.dumps, ASCII-escaped) with the
+shaped encoding from shaping.py, with and without field projection.
+
+Usage:
+    python init_db.py
+    python benchmark.py > bench_output.txt
+"""
+
+import json
+
+from database import medication_exists, get_medication_availability, get_medication_profile, get_branch_availability, find_equivalent_medications
+import shaping
+
+# Token counting - tiktoken is optional (and needs to download its encoding);
+# fall back to a rough estimate
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+
+    TOKENIZER = "tiktoken o200k_base"
+except Exception:
+    def count_tokens(text):
+        # Roughly 4 characters per token for ASCII JSON
+        return max(1, len(text) // 4)
+
+    TOKENIZER = "estimate (4 chars/token, install tiktoken for exact counts)"
+
+MEDICATION_NAMES = ["Acamol", "אקמול", "Optalgin", "Augmentin", "אוגמנטין", "Advil", "Nurofen", "XYZ123"]
+
+# Test users from EVALUATION_PLAN.md (with and without prescriptions)
+USER_IDS = ["123456789", "234567890", "567890123", "456789012"]
+
+# Reference branches for get_branch_availability (None = rank by quantity)
+BRANCH_NAMES = [None, "Tel Aviv", "חיפה"]
+
+# Typical projections - what the model asks for on a price or dosage question
+PROJECTIONS = {
+    "get_medication_availability": ["price"],
+    "get_medication_profile": ["dosage_instructions"]
+}
+
+
+def collect_samples():
+    """
+    Run each tool over the catalog.
+
+    Returns:
+        dict: tool name -> list of raw results
+    """
+    samples = {
+        "medication_exists": [],
+        "get_medication_availability": [],
+        "get_medication_profile": [],
+        "get_branch_availability": [],
+        "find_equivalent_medications": []
+    }
+    medication_ids = set()
+
+    for name in MEDICATION_NAMES:
+        result = medication_exists(name)
+        samples["medication_exists"].append(result)
+        if result.get("found"):
+            medication_ids.add(result["medication"]["id"])
+
+    for medication_id in sorted(medication_ids):
+        samples["get_medication_availability"].append(get_medication_availability(medication_id))
+        for id_number in USER_IDS:
+            samples["get_medication_profile"].append(get_medication_profile(medication_id, id_number))
+        for branch_name in BRANCH_NAMES:
+            samples["get_branch_availability"].append(get_branch_availability(medication_id, branch_name))
+        samples["find_equivalent_medications"].append(find_equivalent_medications(medication_id))
+
+    return samples
+
+
+def run_benchmark():
+    """
+    Compare encodings per tool.
+
+    Returns:
+        list: One dict per tool with average token counts and savings
+    """
+    report = []
+
+    for tool_name, results in collect_samples().items():
+        original = sum(count_tokens(json.dumps(r)) for r in results)
+        compact = sum(count_tokens(shaping.encode_result(shaping.shape_result(tool_name, r))) for r in results)
+
+        projection = PROJECTIONS.get(tool_name)
+        projected = sum(
+            count_tokens(shaping.encode_result(shaping.shape_result(tool_name, r, projection)))
+            for r in results
+        )
+
+        report.append({
+            "tool": tool_name,
+            "calls": len(results),
+            "original_tokens": original / len(results),
+            "compact_tokens": compact / len(results),
+            "projected_tokens": projected / len(results),
+            "projection": projection,
+            "compact_savings": 1 - compact / original,
+            "projected_savings": 1 - projected / original
+        })
+
+    return report
+
+
+if __name__ == "__main__":
+    print(f"Tool result encoding benchmark (tokenizer: {TOKENIZER})\n")
+    print(f"{'Tool':<30} {'Calls':>5} {'Original':>9} {'Compact':>9} {'Projected':>10} {'Saved':>7} {'Saved (proj)':>13}")
+
+    for row in run_benchmark():
+        print(f"{row['tool']:<30} {row['calls']:>5} {row['original_tokens']:>9.1f} {row['compact_tokens']:>9.1f} "
+              f"{row['projected_tokens']:>10.1f} {row['compact_savings']:>7.0%} {row['projected_savings']:>13.0%}")
+
+    print("\nAverages are tokens per call. Tool results are resent on every later iteration of run_agent,")
+    print("so the savings are multiplied by the number of model calls that follow the tool call.")
+    print(f"Projections used: {PROJECTIONS}")
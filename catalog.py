@@ -0,0 +1,122 @@
+"""
+Precomputed catalog snapshot.
+
+The medication name index (English/Hebrew name -> ID) only changes when the
+database is re-seeded, so init_db.py writes it to catalog_snapshot.json at
+build time. The app loads it once per process (via st.cache_resource) and
+medication_exists lookups are answered from memory. Names that are not in the
+snapshot still fall back to the database.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = "catalog_snapshot.json"
+
+# name (lowercase English or Hebrew) -> {"id", "name_english", "name_hebrew"}
+_name_index = None
+
+# medication_names() tries to load the snapshot itself once
+_load_attempted = False
+
+
+def build_snapshot(db_path="pharmacy.db", path=SNAPSHOT_PATH):
+    """
+    Write the catalog snapshot from the database.
+
+    Args:
+        db_path (str): SQLite database file
+        path (str): Output JSON file
+
+    Returns:
+        int: Number of medications in the snapshot
+    """
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name_english, name_hebrew FROM medications ORDER BY id')
+        medications = [
+            {"id": row[0], "name_english": row[1], "name_hebrew": row[2]}
+            for row in cursor.fetchall()
+        ]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"medications": medications}, f, ensure_ascii=False)
+
+    return len(medications)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """
+    Load the catalog snapshot into memory (once per process).
+
+    Args:
+        path (str): Snapshot JSON file
+
+    Returns:
+        int: Number of medications loaded (0 if the snapshot is missing)
+    """
+    global _name_index
+
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, encoding="utf-8") as f:
+        medications = json.load(f)["medications"]
+
+    index = {}
+    for medication in medications:
+        index[medication["name_english"].lower()] = medication
+        index[medication["name_hebrew"]] = medication
+
+    _name_index = index
+    return len(medications)
+
+
+def find_medication(medication_name):
+    """
+    Look up a medication by name in the snapshot.
+
+    Matches like medication_exists: case-insensitive English name or exact Hebrew name.
+
+    Args:
+        medication_name (str): Medication name in English or Hebrew
+
+    Returns:
+        dict: Same shape as medication_exists() if found, otherwise None
+              (also None when no snapshot is loaded)
+    """
+    if _name_index is None or not medication_name:
+        return None
+
+    medication = _name_index.get(medication_name) or _name_index.get(medication_name.lower())
+    if medication is None:
+        return None
+
+    return {"found": True, "medication": dict(medication)}
+
+
+def medication_names():
+    """
+    Names in the snapshot (lowercase English and Hebrew).
+
+    Loads the snapshot on first use if nothing has loaded it yet (scripts,
+    replay, a worker whose warm-up failed).
+
+    Returns:
+        set: Known medication names (empty when no snapshot is available)
+    """
+    global _load_attempted
+
+    if _name_index is None and not _load_attempted:
+        _load_attempted = True
+        if not load_snapshot(SNAPSHOT_PATH):
+            logger.warning("%s not found - run init_db.py; medication names are unknown "
+                           "and every lookup routes to the large model", SNAPSHOT_PATH)
+
+    if _name_index is None:
+        return set()
+    return set(_name_index)
@@ -1,5 +1,10 @@
 import sqlite3
 
+# get_branch_availability returns DEFAULT_BRANCH_RESULTS branches unless asked
+# for between 1 and MAX_BRANCH_RESULTS
+DEFAULT_BRANCH_RESULTS = 5
+MAX_BRANCH_RESULTS = 20
+
 def medication_exists(medication_name):
     """
     Check if a medication exists in the database by name.
@@ -63,7 +68,7 @@ def get_medication_availability(medication_id):
         dict: A dictionary containing:
             - "found" (bool): True if medication exists, False otherwise
             - "in_stock" (bool): True if available, False if out of stock
-            - "stock_quantity" (int): Current quantity in stock
+            - "stock_quantity" (int): Current quantity in stock across all branches
             - "price" (float): Price in Israeli Shekels (₪)
             - "error" (str, optional): Error message if database error occurred
     """
@@ -71,11 +76,14 @@ def get_medication_availability(medication_id):
         with sqlite3.connect('pharmacy.db') as conn:
             cursor = conn.cursor()
 
-            # Query only stock and price (minimal data)
+            # Query only stock and price (minimal data). Stock is the sum over
+            # branch_inventory - the single source of truth for quantities
             cursor.execute('''
-                SELECT stock_quantity, price
-                FROM medications
-                WHERE id = ?
+                SELECT
+                    (SELECT COALESCE(SUM(quantity), 0) FROM branch_inventory WHERE medication_id = m.id),
+                    m.price
+                FROM medications m
+                WHERE m.id = ?
             ''', (medication_id,))
 
             result = cursor.fetchone()
@@ -271,3 +279,196 @@ def check_user_prescription(id_number, medication_id):
             "error": f"Database error: {str(e)}"
         }
 
+
+
+def get_branch_availability(medication_id, branch_name=None, limit=DEFAULT_BRANCH_RESULTS):
+    """
+    Get the branches that have a medication in stock.
+
+    If branch_name is given, branches are ranked by distance from that branch
+    (using the precomputed branch_distances table). Otherwise they are ranked
+    by quantity in stock.
+
+    Args:
+        medication_id (int): Medication ID from database
+        branch_name (str, optional): Reference branch - English/Hebrew name or city
+        limit (int): Maximum number of branches to return (clamped to 1..MAX_BRANCH_RESULTS;
+                     the default is used if it is not a number)
+
+    Returns:
+        dict: {
+            "found": bool (False if the reference branch is unknown),
+            "reference_branch": {"id", "name_english", "name_hebrew"} or None,
+            "branches": [
+                {"id", "name_english", "name_hebrew", "city", "quantity", "distance_km"}
+            ],
+            "message": str (if the reference branch is unknown),
+            "error": str (if database error)
+        }
+    """
+    # The limit comes from the model - ignore values that are not numbers.
+    # A negative LIMIT means no limit in SQLite, so clamp it
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = DEFAULT_BRANCH_RESULTS
+    limit = max(1, min(limit, MAX_BRANCH_RESULTS))
+
+    try:
+        with sqlite3.connect('pharmacy.db') as conn:
+            cursor = conn.cursor()
+
+            reference_branch = None
+
+            if branch_name:
+                cursor.execute('''
+                    SELECT id, name_english, name_hebrew
+                    FROM branches
+                    WHERE LOWER(name_english) = LOWER(?)
+                       OR name_hebrew = ?
+                       OR LOWER(city) = LOWER(?)
+                       OR city_hebrew = ?
+                    ORDER BY id
+                    LIMIT 1
+                ''', (branch_name, branch_name, branch_name, branch_name))
+
+                result = cursor.fetchone()
+
+                if not result:
+                    return {
+                        "found": False,
+                        "branches": [],
+                        "message": f"Unknown branch: {branch_name}"
+                    }
+
+                reference_branch = {
+                    "id": result[0],
+                    "name_english": result[1],
+                    "name_hebrew": result[2]
+                }
+
+                # Walk branches nearest-first and keep those with stock
+                cursor.execute('''
+                    SELECT b.id, b.name_english, b.name_hebrew, b.city, i.quantity, d.distance_km
+                    FROM branch_distances d
+                    JOIN branch_inventory i
+                      ON i.medication_id = ? AND i.branch_id = d.to_branch_id
+                    JOIN branches b ON b.id = d.to_branch_id
+                    WHERE d.from_branch_id = ? AND i.quantity > 0
+                    ORDER BY d.distance_km
+                    LIMIT ?
+                ''', (medication_id, reference_branch["id"], limit))
+
+            else:
+                cursor.execute('''
+                    SELECT b.id, b.name_english, b.name_hebrew, b.city, i.quantity, NULL
+                    FROM branch_inventory i
+                    JOIN branches b ON b.id = i.branch_id
+                    WHERE i.medication_id = ? AND i.quantity > 0
+                    ORDER BY i.quantity DESC
+                    LIMIT ?
+                ''', (medication_id, limit))
+
+            branches = [
+                {
+                    "id": row[0],
+                    "name_english": row[1],
+                    "name_hebrew": row[2],
+                    "city": row[3],
+                    "quantity": row[4],
+                    "distance_km": row[5]
+                }
+                for row in cursor.fetchall()
+            ]
+
+            return {
+                "found": True,
+                "reference_branch": reference_branch,
+                "branches": branches
+            }
+
+    except sqlite3.Error as e:
+        return {
+            "found": False,
+            "branches": [],
+            "error": f"Database error: {str(e)}"
+        }
+
+
+def find_equivalent_medications(medication_id):
+    """
+    Find in-stock medications with the same active ingredients and strengths.
+
+    Uses the medication_ingredients inverted index, so all alternatives are
+    found in one query. Only commercial information is returned (names, price,
+    stock) - never leaflet data, so prescription-gated information is not exposed.
+
+    Args:
+        medication_id (int): Medication ID from database
+
+    Returns:
+        dict: {
+            "found": bool,
+            "alternatives": [
+                {"id", "name_english", "name_hebrew", "price", "stock_quantity", "requires_prescription"}
+            ],
+            "error": str (if database error)
+        }
+    """
+    try:
+        with sqlite3.connect('pharmacy.db') as conn:
+            cursor = conn.cursor()
+
+            # Same ingredient set: every ingredient matches (name + strength + concentration unit)
+            # and both medications have the same number of ingredients
+            cursor.execute('''
+                SELECT m.id, m.name_english, m.name_hebrew, m.price,
+                       (SELECT COALESCE(SUM(quantity), 0) FROM branch_inventory WHERE medication_id = m.id) AS stock,
+                       m.requires_prescription
+                FROM medication_ingredients src
+                JOIN medication_ingredients alt
+                  ON alt.ingredient = src.ingredient
+                 AND alt.strength_mg = src.strength_mg
+                 AND alt.per_unit = src.per_unit
+                 AND alt.medication_id != src.medication_id
+                JOIN medications m ON m.id = alt.medication_id
+                WHERE src.medication_id = ?
+                GROUP BY m.id
+                HAVING COUNT(*) = (SELECT COUNT(*) FROM medication_ingredients WHERE medication_id = ?)
+                   AND COUNT(*) = (SELECT COUNT(*) FROM medication_ingredients WHERE medication_id = m.id)
+                   AND stock > 0
+                ORDER BY m.price
+            ''', (medication_id, medication_id))
+
+            alternatives = [
+                {
+                    "id": row[0],
+                    "name_english": row[1],
+                    "name_hebrew": row[2],
+                    "price": row[3],
+                    "stock_quantity": row[4],
+                    "requires_prescription": bool(row[5])
+                }
+                for row in cursor.fetchall()
+            ]
+
+            if not alternatives:
+                # Distinguish "no alternatives" from "unknown medication"
+                cursor.execute('SELECT 1 FROM medications WHERE id = ?', (medication_id,))
+                if cursor.fetchone() is None:
+                    return {
+                        "found": False,
+                        "alternatives": []
+                    }
+
+            return {
+                "found": True,
+                "alternatives": alternatives
+            }
+
+    except sqlite3.Error as e:
+        return {
+            "found": False,
+            "alternatives": [],
+            "error": f"Database error: {str(e)}"
+        }
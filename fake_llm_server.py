@@ -0,0 +1,130 @@
+"""
+Local fake OpenAI chat completions server with fault injection.
+
+Used to exercise llm_client.py without calling the real API. Supports:
+- Base latency for every response
+- A fraction of slow responses (to trigger hedging)
+- A fraction of HTTP 500 errors (to trigger retries and the circuit breaker)
+- Deterministic faults for tests: the next N requests slow or failing
+
+Usage:
+    python fake_llm_server.py --port 8765 --error-rate 0.2 --slow-rate 0.1
+    # then point OpenAI(base_url="http://127.0.0.1:8765/v1") at it
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions with a fixed assistant reply."""
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server.lock:
+            config["requests"] += 1
+            slow_next, fail_next = config["slow_next"] > 0, config["fail_next"] > 0
+            config["slow_next"] -= slow_next
+            config["fail_next"] -= fail_next
+
+        # Inject latency
+        if slow_next or random.random() < config["slow_rate"]:
+            time.sleep(config["slow_latency"])
+        else:
+            time.sleep(config["latency"])
+
+        # Inject errors
+        if fail_next or random.random() < config["error_rate"]:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{random.randint(0, 10**9)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": config["reply"]},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        })
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        try:
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this request (e.g. the hedge won)
+            pass
+
+    def log_message(self, format, *args):
+        # Keep output quiet
+        pass
+
+
+def start_fake_server(port=0, latency=0.05, slow_rate=0.0, slow_latency=2.0, error_rate=0.0, reply="OK"):
+    """
+    Start the fake server in a background thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free port)
+        latency (float): Normal response latency in seconds
+        slow_rate (float): Fraction of responses that take slow_latency instead
+        slow_latency (float): Latency of slow responses in seconds
+        error_rate (float): Fraction of requests answered with HTTP 500
+        reply (str): Assistant message content
+
+    Set server.config["slow_next"] or ["fail_next"] to make the next N requests slow or
+    fail; server.config["requests"] counts requests received.
+
+    Returns:
+        ThreadingHTTPServer: The running server (call .shutdown() to stop)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.config = {
+        "latency": latency,
+        "slow_rate": slow_rate,
+        "slow_latency": slow_latency,
+        "error_rate": error_rate,
+        "reply": reply,
+        "slow_next": 0,
+        "fail_next": 0,
+        "requests": 0
+    }
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.port, args.latency, args.slow_rate, args.slow_latency, args.error_rate)
+    print(f"Fake LLM server listening on http://127.0.0.1:{server.server_address[1]}/v1")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
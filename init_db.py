@@ -1,5 +1,72 @@
+import math
+import re
 import sqlite3
 
+from audit import create_audit_table
+from catalog import build_snapshot
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometers"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+# Strength unit conversion to milligrams
+UNIT_TO_MG = {'mg': 1.0, 'g': 1000.0, 'mcg': 0.001}
+
+# Concentration denominators ('250mg/5ml', '65 mg/tab') -> stored per_unit
+PER_UNITS = {
+    'ml': 'ml',
+    'tab': 'tablet', 'tabs': 'tablet', 'tablet': 'tablet', 'tablets': 'tablet',
+    'cap': 'capsule', 'caps': 'capsule', 'capsule': 'capsule', 'capsules': 'capsule'
+}
+
+INGREDIENT_PATTERN = re.compile(
+    r'^\s*(.+?)\s+(\d+(?:\.\d+)?)\s*(mg|g|mcg)(?:\s*/\s*(\d+(?:\.\d+)?)?\s*([a-z]+))?\s*$',
+    re.IGNORECASE
+)
+
+
+def parse_active_ingredients(text):
+    """
+    Parse an active_ingredients string into (ingredient, strength_mg, per_unit) triples.
+
+    per_unit is '' for a plain strength. Concentrations are normalized to one
+    unit ('250mg/5ml' -> 50.0 per 'ml'), so they only match the same concentration.
+
+    Example: 'Amoxicillin 875mg + Clavulanic acid 125mg'
+             -> [('amoxicillin', 875.0, ''), ('clavulanic acid', 125.0, '')]
+
+    Raises:
+        ValueError: If any part cannot be parsed (a partial parse would match wrong equivalents)
+    """
+    if not (text or '').strip():
+        return []
+
+    ingredients = []
+    for part in text.split('+'):
+        match = INGREDIENT_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"cannot parse ingredient '{part.strip()}'")
+
+        name, amount, unit, per_quantity, per_unit = match.groups()
+        strength_mg = float(amount) * UNIT_TO_MG[unit.lower()]
+
+        if per_unit is None:
+            per_unit = ''
+        elif per_unit.lower() in PER_UNITS:
+            strength_mg /= float(per_quantity or 1)
+            per_unit = PER_UNITS[per_unit.lower()]
+        else:
+            raise ValueError(f"unknown concentration unit '{per_unit}' in '{part.strip()}'")
+
+        ingredients.append((name.strip().lower(), strength_mg, per_unit))
+
+    return ingredients
+
+
 def init_database():
     """Creates the database and tables with initial data"""
 
@@ -11,6 +78,10 @@ def init_database():
     cursor.execute('DROP TABLE IF EXISTS medications')
     cursor.execute('DROP TABLE IF EXISTS users')
     cursor.execute('DROP TABLE IF EXISTS prescriptions')
+    cursor.execute('DROP TABLE IF EXISTS branches')
+    cursor.execute('DROP TABLE IF EXISTS branch_inventory')
+    cursor.execute('DROP TABLE IF EXISTS branch_distances')
+    cursor.execute('DROP TABLE IF EXISTS medication_ingredients')
 
     # Create medications table
     cursor.execute('''
@@ -18,7 +89,6 @@ def init_database():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name_english TEXT NOT NULL UNIQUE,
             name_hebrew TEXT NOT NULL,
-            stock_quantity INTEGER DEFAULT 0,
             price REAL DEFAULT 0.0,
             dosage_instructions TEXT,
             usage_instructions TEXT,
@@ -49,37 +119,94 @@ def init_database():
             )
         ''')
 
+    # Create parsed active ingredients table (one row per ingredient per medication)
+    cursor.execute('''
+        CREATE TABLE medication_ingredients (
+            medication_id INTEGER NOT NULL,
+            ingredient TEXT NOT NULL,
+            strength_mg REAL NOT NULL,
+            per_unit TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (medication_id, ingredient),
+            FOREIGN KEY (medication_id) REFERENCES medications(id)
+        ) WITHOUT ROWID
+    ''')
+    # Inverted index: ingredient + strength (+ concentration unit) -> medications
+    cursor.execute('CREATE INDEX idx_medication_ingredients_lookup ON medication_ingredients (ingredient, strength_mg, per_unit, medication_id)')
+
+    # Create audit log (append-only, never dropped - kept across re-seeds)
+    create_audit_table(cursor)
+
+    # Create branches table (one row per store in the chain)
+    cursor.execute('''
+        CREATE TABLE branches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name_english TEXT NOT NULL UNIQUE,
+            name_hebrew TEXT NOT NULL,
+            city TEXT NOT NULL,
+            city_hebrew TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        )
+    ''')
+
+    # Create branch inventory table - keyed by medication first, so
+    # "which branches stock medication X" is a single index range scan
+    cursor.execute('''
+        CREATE TABLE branch_inventory (
+            medication_id INTEGER NOT NULL,
+            branch_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (medication_id, branch_id),
+            FOREIGN KEY (medication_id) REFERENCES medications(id),
+            FOREIGN KEY (branch_id) REFERENCES branches(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_branch_inventory_branch ON branch_inventory (branch_id, medication_id)')
+
+    # Create precomputed branch-to-branch distances (no geo math at query time)
+    cursor.execute('''
+        CREATE TABLE branch_distances (
+            from_branch_id INTEGER NOT NULL,
+            to_branch_id INTEGER NOT NULL,
+            distance_km REAL NOT NULL,
+            PRIMARY KEY (from_branch_id, to_branch_id),
+            FOREIGN KEY (from_branch_id) REFERENCES branches(id),
+            FOREIGN KEY (to_branch_id) REFERENCES branches(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_branch_distances_nearest ON branch_distances (from_branch_id, distance_km, to_branch_id)')
+
     # Insert 5 medications
     medications = [
-        ('Acamol', 'אקמול', 150, 25.90,
+        ('Acamol', 'אקמול', 25.90,
          'Adults: 1-2 tablets every 6-8 hours. Max 8 tablets per day.',
          'Take with water. Can be taken with or without food.',
          0,  # No prescription required
          'Pain reliever and fever reducer. Effective for headaches, muscle pain, and fever.',
          'Paracetamol 500mg'),
 
-        ('Optalgin', 'אופטלגין', 0, 32.50,
+        ('Optalgin', 'אופטלגין', 32.50,
          'Adults: 1 tablet up to 3 times daily.',
          'Take with food to reduce stomach irritation.',
          0,  # No prescription required
          'Pain reliever for moderate to severe pain. Effective for headaches and menstrual pain.',
          'Metamizole 500mg'),
 
-        ('Augmentin', 'אוגמנטין', 45, 89.00,
+        ('Augmentin', 'אוגמנטין', 89.00,
          'Adults: 1 tablet twice daily for 7-10 days.',
          'Complete the full course even if symptoms improve. Take with food.',
          1,  # Prescription required
          'Antibiotic for bacterial infections. Used for respiratory, urinary, and skin infections.',
          'Amoxicillin 875mg + Clavulanic acid 125mg'),
 
-        ('Advil', 'אדוויל', 200, 28.90,
+        ('Advil', 'אדוויל', 28.90,
          'Adults: 1-2 tablets every 6-8 hours. Max 6 tablets per day.',
          'Take with food or milk to reduce stomach upset.',
          0,  # No prescription required
          'Anti-inflammatory pain reliever. Effective for pain, inflammation, and fever.',
          'Ibuprofen 400mg'),
 
-        ('Nurofen', 'נורופן', 80, 35.00,
+        ('Nurofen', 'נורופן', 35.00,
          'Adults: 1 tablet every 6-8 hours as needed. Max 3 tablets per day.',
          'Take with food or milk. Do not exceed recommended dose.',
          0,  # No prescription required
@@ -89,12 +216,31 @@ def init_database():
 
     cursor.executemany('''
         INSERT INTO medications 
-        (name_english, name_hebrew, stock_quantity, price, 
+        (name_english, name_hebrew, price, 
          dosage_instructions, usage_instructions, requires_prescription, 
          factual_info, active_ingredients)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     ''', medications)
 
+    # Index parsed active ingredients - a medication with any unparseable part is
+    # left out entirely, so it never matches on a subset of its ingredients
+    cursor.execute('SELECT id, name_english, active_ingredients FROM medications')
+    ingredient_rows = []
+    skipped = []
+    for medication_id, name_english, active_ingredients in cursor.fetchall():
+        try:
+            parsed = parse_active_ingredients(active_ingredients)
+        except ValueError as e:
+            skipped.append((name_english, str(e)))
+            continue
+        ingredient_rows.extend((medication_id,) + ingredient for ingredient in parsed)
+
+    cursor.executemany('''
+        INSERT INTO medication_ingredients
+        (medication_id, ingredient, strength_mg, per_unit)
+        VALUES (?, ?, ?, ?)
+    ''', ingredient_rows)
+
     # Insert 10 users
     users = [
         ('123456789', 'David', 'Cohen', '050-1234567'),
@@ -133,14 +279,67 @@ def init_database():
             VALUES (?, ?)
         ''', prescriptions)
 
+    # Insert 6 branches
+    branches = [
+        ('Tel Aviv Dizengoff', 'תל אביב דיזנגוף', 'Tel Aviv', 'תל אביב', 32.0809, 34.7806),
+        ('Jerusalem Center', 'ירושלים מרכז', 'Jerusalem', 'ירושלים', 31.7833, 35.2167),
+        ('Haifa', 'חיפה', 'Haifa', 'חיפה', 32.7940, 34.9896),
+        ('Beer Sheva', 'באר שבע', 'Beer Sheva', 'באר שבע', 31.2518, 34.7913),
+        ('Netanya', 'נתניה', 'Netanya', 'נתניה', 32.3215, 34.8532),
+        ('Rishon LeZion', 'ראשון לציון', 'Rishon LeZion', 'ראשון לציון', 31.9730, 34.7925)
+    ]
+
+    cursor.executemany('''
+        INSERT INTO branches
+        (name_english, name_hebrew, city, city_hebrew, latitude, longitude)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', branches)
+
+    # Insert branch inventory - the only stock data; chain-wide stock is the sum over branches
+    branch_quantities = {
+        1: [40, 30, 25, 15, 20, 20],   # Acamol (150)
+        2: [0, 0, 0, 0, 0, 0],         # Optalgin (out of stock everywhere)
+        3: [15, 0, 10, 5, 0, 15],      # Augmentin (45)
+        4: [50, 40, 30, 20, 30, 30],   # Advil (200)
+        5: [0, 25, 20, 0, 15, 20]      # Nurofen (80)
+    }
+
+    cursor.executemany('''
+        INSERT INTO branch_inventory
+        (medication_id, branch_id, quantity)
+        VALUES (?, ?, ?)
+    ''', [
+        (medication_id, branch_id, quantity)
+        for medication_id, quantities in branch_quantities.items()
+        for branch_id, quantity in enumerate(quantities, 1)
+    ])
+
+    # Precompute distances between every pair of branches (including itself, at 0 km)
+    cursor.executemany('''
+        INSERT INTO branch_distances
+        (from_branch_id, to_branch_id, distance_km)
+        VALUES (?, ?, ?)
+    ''', [
+        (from_id, to_id, round(haversine_km(from_branch[4], from_branch[5], to_branch[4], to_branch[5]), 1))
+        for from_id, from_branch in enumerate(branches, 1)
+        for to_id, to_branch in enumerate(branches, 1)
+    ])
+
     # Save and close
     conn.commit()
     conn.close()
 
+    # Precompute the catalog name index for fast startup
+    build_snapshot('pharmacy.db')
+
     print("Database initialized successfully!")
     print(f"   - Created 'pharmacy.db'")
     print(f"   - Added {len(medications)} medications")
     print(f"   - Added {len(users)} users")
+    print(f"   - Added {len(branches)} branches")
+    print(f"   - Wrote catalog snapshot")
+    for name_english, error in skipped:
+        print(f"   ! {name_english}: not indexed for equivalents ({error})")
 
 if __name__ == "__main__":
     init_database()
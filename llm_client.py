@@ -0,0 +1,354 @@
+"""
+Resilient wrapper around the OpenAI chat completions API.
+
+Adds what the raw client call in run_agent is missing:
+- Per-turn deadline shared by every call in one run_agent turn
+- Retries with jittered exponential backoff for timeouts, 429 and 5xx errors
+- Optional hedged second request once a call is slower than the observed p95
+- Circuit breaker that fails fast while the provider is down
+
+Requests never wait in a local queue: an unhedged request runs on the caller's
+thread, and a hedged attempt only uses the worker pool when a worker is free
+(otherwise the request runs unhedged on the caller's thread).
+
+Run `python llm_client.py` to exercise it against fake_llm_server.py with
+injected latency and errors.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no response could be obtained within the deadline."""
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list): Numbers (need not be sorted)
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def is_retryable(error):
+    """Timeouts, connection errors, rate limits and 5xx errors are worth retrying."""
+    # Imported here so importing this module does not pull in the OpenAI SDK
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated upstream failures.
+
+    closed    - requests flow normally
+    open      - requests are rejected until reset_timeout has passed
+    half_open - a single trial request is allowed; success closes the circuit
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class ResilientLLMClient:
+    """
+    Drop-in replacement for `client.chat.completions.create`.
+
+    Usage:
+        llm = ResilientLLMClient(OpenAI(api_key=...))
+        response = llm.create(deadline=time.monotonic() + 60, model=..., messages=...)
+    """
+
+    def __init__(self, client, max_retries=3, base_backoff=0.5, max_backoff=8.0,
+                 hedge=True, hedge_percentile=95, hedge_min_samples=20,
+                 failure_threshold=5, reset_timeout=30.0, max_workers=8):
+        """
+        Args:
+            client: OpenAI client (its own retries are disabled per call)
+            max_retries (int): Retries after the first attempt
+            base_backoff (float): Base delay in seconds for exponential backoff
+            max_backoff (float): Upper bound for a single backoff delay
+            hedge (bool): Send a second request when the first is slower than the hedge threshold
+            hedge_percentile (float): Latency percentile used as the hedge threshold
+            hedge_min_samples (int): Latency samples required before hedging starts
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds the circuit stays open before a trial request
+            max_workers (int): Threads available for hedged attempts (primary and hedge request)
+        """
+        self._client = client
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self._latencies = deque(maxlen=200)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        # One slot per worker: work is only submitted when a worker is free, so nothing queues
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "failures": 0,
+            "rejected": 0
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def hedge_threshold(self):
+        """Latency after which a hedged request is sent, or None if not enough data."""
+        with self._lock:
+            samples = list(self._latencies)
+
+        if not self.hedge or len(samples) < self.hedge_min_samples:
+            return None
+        return percentile(samples, self.hedge_percentile)
+
+    def _send(self, timeout, kwargs):
+        """Send one request and record its latency on success."""
+        start_time = time.monotonic()
+        response = self._client.with_options(timeout=timeout, max_retries=0).chat.completions.create(**kwargs)
+
+        with self._lock:
+            self._latencies.append(time.monotonic() - start_time)
+        return response
+
+    def _submit(self, timeout, kwargs):
+        """Send a request on a free pool worker. Returns its future, or None if every worker is busy."""
+        if not self._slots.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return self._send(timeout, kwargs)
+            finally:
+                self._slots.release()
+
+        return self._executor.submit(run)
+
+    def _attempt(self, remaining, kwargs):
+        """One attempt, possibly hedged. Returns the first successful response."""
+        self._count("attempts")
+        deadline = time.monotonic() + remaining
+
+        threshold = self.hedge_threshold()
+        if threshold is None or threshold >= remaining:
+            return self._send(remaining, kwargs)
+
+        primary = self._submit(remaining, kwargs)
+        if primary is None:
+            # Pool saturated - send unhedged rather than wait for a worker
+            return self._send(remaining, kwargs)
+        pending = {primary}
+
+        done, _ = wait(pending, timeout=threshold)
+        if not done:
+            hedge = self._submit(deadline - time.monotonic(), kwargs)
+            if hedge is not None:
+                self._count("hedges")
+                pending.add(hedge)
+
+        error = None
+
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+
+        if error is not None:
+            raise error
+        raise LLMUnavailableError("Deadline exceeded")
+
+    def create(self, deadline=None, **kwargs):
+        """
+        Call chat.completions.create with deadline, retries, hedging and circuit breaker.
+
+        Args:
+            deadline (float, optional): Absolute time.monotonic() by which a response is needed
+            **kwargs: Passed through to chat.completions.create
+
+        Returns:
+            ChatCompletion: The OpenAI response
+
+        Raises:
+            LLMUnavailableError: Deadline exceeded, retries exhausted or circuit open
+        """
+        self._count("calls")
+        if deadline is None:
+            deadline = time.monotonic() + 60.0
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("failures")
+                raise LLMUnavailableError("Deadline exceeded")
+
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise LLMUnavailableError("Circuit open - LLM provider is failing")
+
+            try:
+                response = self._attempt(remaining, kwargs)
+                self.breaker.record_success()
+                return response
+
+            except LLMUnavailableError:
+                # Every request was on the wire (nothing queues locally) and none answered in time
+                self.breaker.record_failure()
+                self._count("failures")
+                raise
+
+            except Exception as e:
+                if not is_retryable(e):
+                    # Caller errors (400, auth) are not the provider's fault
+                    self.breaker.record_success()
+                    raise
+
+                self.breaker.record_failure()
+
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise LLMUnavailableError(f"LLM request failed after {attempt + 1} attempts: {e}") from e
+
+                # Full jitter backoff, never sleeping past the deadline
+                attempt += 1
+                self._count("retries")
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+
+    def get_stats(self):
+        """
+        Report client statistics.
+
+        Returns:
+            dict: counters plus "circuit_state", "p50_latency", "p95_latency"
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            samples = list(self._latencies)
+
+        stats["circuit_state"] = self.breaker.state
+        stats["p50_latency"] = percentile(samples, 50)
+        stats["p95_latency"] = percentile(samples, 95)
+        return stats
+
+
+# Exercise the client against a local fake server with injected faults
+if __name__ == "__main__":
+    from openai import OpenAI
+    from fake_llm_server import start_fake_server
+
+    server = start_fake_server(latency=0.05, slow_rate=0.04, slow_latency=1.5, error_rate=0.2)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    llm = ResilientLLMClient(OpenAI(api_key="fake", base_url=base_url),
+                             base_backoff=0.05, hedge_min_samples=10, reset_timeout=1.0)
+
+    def run_requests(count):
+        succeeded, failed, durations = 0, 0, []
+        for _ in range(count):
+            start = time.monotonic()
+            try:
+                llm.create(deadline=time.monotonic() + 5, model="fake",
+                           messages=[{"role": "user", "content": "ping"}])
+                succeeded += 1
+            except LLMUnavailableError:
+                failed += 1
+            durations.append(time.monotonic() - start)
+        return succeeded, failed, durations
+
+    # Phase 1: transient errors and slow responses
+    succeeded, failed, durations = run_requests(100)
+    print(f"Phase 1 - 20% errors, 4% slow responses ({base_url})")
+    print(f"  Succeeded: {succeeded}, failed: {failed}")
+    print(f"  End-to-end p50: {percentile(durations, 50):.3f}s, p95: {percentile(durations, 95):.3f}s, "
+          f"max: {max(durations):.3f}s")
+    print(f"  Client stats: {llm.get_stats()}")
+
+    # Phase 2: provider outage - the circuit should open and fail fast
+    server.config["error_rate"] = 1.0
+    succeeded, failed, durations = run_requests(10)
+    print("Phase 2 - 100% errors")
+    print(f"  Succeeded: {succeeded}, failed: {failed}, max latency: {max(durations):.3f}s")
+    print(f"  Client stats: {llm.get_stats()}")
+
+    # Phase 3: provider recovers - a trial request closes the circuit
+    server.config["error_rate"] = 0.0
+    time.sleep(1.0)
+    succeeded, failed, durations = run_requests(10)
+    print("Phase 3 - recovered")
+    print(f"  Succeeded: {succeeded}, failed: {failed}, circuit: {llm.breaker.state}")
+
+    server.shutdown()
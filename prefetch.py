@@ -0,0 +1,191 @@
+"""
+Speculative prefetch of likely follow-up tool results.
+
+After medication_exists resolves a medication ID, the model almost always calls
+get_medication_availability or get_medication_profile next (see
+MULTI_STEP_WORKFLOWS.md). This module warms both results in the background so
+the next tool call is served from memory instead of the database.
+
+Profile results are prefetched with the current user's ID number, so the
+prescription gate in get_medication_profile is applied exactly as it would be
+for a live call, and a prefetched profile is only ever served to that user.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_medication_availability, get_medication_profile
+
+# Enable/disable with PHARMACY_PREFETCH=0
+PREFETCH_ENABLED = os.getenv("PHARMACY_PREFETCH", "1") != "0"
+
+# Prefetched results older than this are discarded (stock may change)
+PREFETCH_TTL_SECONDS = float(os.getenv("PHARMACY_PREFETCH_TTL", "30"))
+
+# Upper bound on cached entries - oldest entries are evicted first
+PREFETCH_MAX_ENTRIES = 256
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+
+# key -> (created_at, future)
+_entries = {}
+
+_stats = {
+    "prefetched": 0,  # Results scheduled in the background
+    "hits": 0,        # Tool calls served from a prefetched result
+    "misses": 0,      # Tool calls that had no usable prefetched result
+    "wasted": 0       # Prefetched results that expired or were evicted unused
+}
+
+
+def _make_key(tool_name, medication_id, id_number=None):
+    """
+    Build the cache key for a tool result.
+
+    Availability is the same for every user, so only profile results are
+    keyed by the user's ID number.
+    """
+    if tool_name == "get_medication_profile":
+        return (tool_name, medication_id, id_number)
+    return (tool_name, medication_id, None)
+
+
+def _evict_expired(now):
+    """Drop expired entries and count them as wasted. Caller holds _lock."""
+    expired = [key for key, (created_at, _) in _entries.items()
+               if now - created_at > PREFETCH_TTL_SECONDS]
+
+    for key in expired:
+        _entries.pop(key)[1].cancel()
+        _stats["wasted"] += 1
+
+
+def _store(key, future, now):
+    """Store a prefetched future, evicting the oldest entry if full. Caller holds _lock."""
+    if key in _entries:
+        # Replacing an unused result - the old one was wasted
+        _entries[key][1].cancel()
+        _stats["wasted"] += 1
+    elif len(_entries) >= PREFETCH_MAX_ENTRIES:
+        oldest_key = min(_entries, key=lambda k: _entries[k][0])
+        _entries.pop(oldest_key)[1].cancel()
+        _stats["wasted"] += 1
+
+    _entries[key] = (now, future)
+    _stats["prefetched"] += 1
+
+
+def schedule_followups(medication_id, id_number=None):
+    """
+    Warm availability and profile results for a medication in the background.
+
+    Args:
+        medication_id (int): Medication ID resolved by medication_exists
+        id_number (str, optional): Current user's ID number for the prescription gate
+    """
+    if not PREFETCH_ENABLED or medication_id is None:
+        return
+
+    now = time.monotonic()
+
+    with _lock:
+        _evict_expired(now)
+
+        _store(
+            _make_key("get_medication_availability", medication_id),
+            _executor.submit(get_medication_availability, medication_id),
+            now
+        )
+        _store(
+            _make_key("get_medication_profile", medication_id, id_number),
+            _executor.submit(get_medication_profile, medication_id, id_number),
+            now
+        )
+
+
+def take(tool_name, medication_id, id_number=None):
+    """
+    Return a prefetched result and remove it from the cache.
+
+    Never waits: a result that is still queued or running is cancelled (if it
+    has not started) and counted as a miss, so the live call runs instead of
+    queueing behind other sessions' prefetches.
+
+    Args:
+        tool_name (str): get_medication_availability or get_medication_profile
+        medication_id (int): Medication ID
+        id_number (str, optional): Current user's ID number
+
+    Returns:
+        dict: The prefetched tool result, or None if there is no usable result
+    """
+    if not PREFETCH_ENABLED:
+        return None
+
+    key = _make_key(tool_name, medication_id, id_number)
+
+    with _lock:
+        _evict_expired(time.monotonic())
+        entry = _entries.pop(key, None)
+
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+    future = entry[1]
+    if not future.done():
+        future.cancel()
+        with _lock:
+            _stats["wasted"] += 1
+            _stats["misses"] += 1
+        return None
+
+    result = future.result() if future.exception() is None else None
+
+    with _lock:
+        # Database errors are not worth serving - let the live call retry
+        if result is None or result.get("error"):
+            _stats["wasted"] += 1
+            _stats["misses"] += 1
+            return None
+
+        _stats["hits"] += 1
+
+    return result
+
+
+def get_prefetch_stats():
+    """
+    Report prefetch effectiveness.
+
+    Returns:
+        dict: {
+            "prefetched": int,
+            "hits": int,
+            "misses": int,
+            "wasted": int,
+            "pending": int (prefetched results not yet used or expired),
+            "hit_ratio": float (hits / tool calls that checked the cache),
+            "waste_ratio": float (wasted / prefetched)
+        }
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = len(_entries)
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    stats["waste_ratio"] = stats["wasted"] / stats["prefetched"] if stats["prefetched"] else 0.0
+
+    return stats
+
+
+def reset_prefetch():
+    """Clear all cached results and statistics."""
+    with _lock:
+        _entries.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,165 @@
+"""
+Admission control in front of the agent.
+
+- RateLimiter: token bucket per user (keyed by ID number), so one user cannot
+  flood the LLM and the database
+- SingleFlight: requests with the same key share one agent execution instead
+  of each calling run_agent. app.py keys by a submission ID assigned when the
+  message is accepted; the completed result is kept for COMPLETED_RESULT_TTL
+  seconds, so a Streamlit rerun that interrupted the first run before it
+  stored the answer reuses it instead of calling run_agent again
+
+Configuration (environment variables):
+    PHARMACY_RATE_LIMIT_PER_MINUTE - Sustained messages per user per minute (default 10)
+    PHARMACY_RATE_LIMIT_BURST      - Messages a user may send back-to-back (default 5)
+"""
+
+import os
+import threading
+import time
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv("PHARMACY_RATE_LIMIT_PER_MINUTE", "10"))
+RATE_LIMIT_BURST = float(os.getenv("PHARMACY_RATE_LIMIT_BURST", "5"))
+
+# Idle buckets are pruned once this many users are tracked
+MAX_TRACKED_KEYS = 10000
+
+# Seconds a completed SingleFlight result stays available to later callers
+COMPLETED_RESULT_TTL = 120.0
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, cost=1.0):
+        """
+        Take tokens if available.
+
+        Returns:
+            tuple: (allowed, retry_after) - retry_after is seconds until enough tokens (0 if allowed)
+        """
+        self._refill(time.monotonic())
+
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+
+        return False, (cost - self.tokens) / self.rate
+
+    def is_full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Token bucket per key (user ID number)."""
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST):
+        """
+        Args:
+            per_minute (float): Sustained requests per minute per key
+            burst (float): Bucket capacity - requests allowed back-to-back
+        """
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """
+        Consume one request for `key`.
+
+        Args:
+            key (str): User's ID number
+
+        Returns:
+            tuple: (allowed, retry_after) - retry_after in seconds (0 if allowed)
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_KEYS:
+                    self._prune()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+
+            return bucket.take()
+
+    def _prune(self):
+        """Forget users whose bucket has refilled - they are back to the default state. Caller holds _lock."""
+        for key in [k for k, bucket in self._buckets.items() if bucket.is_full()]:
+            del self._buckets[key]
+
+
+class SingleFlight:
+    """
+    Run a function once per key. Concurrent callers with the same key share the
+    result, and so do later callers within result_ttl seconds of completion.
+    """
+
+    def __init__(self, result_ttl=COMPLETED_RESULT_TTL):
+        """
+        Args:
+            result_ttl (float): Seconds a successful result is kept for later callers (0 = not kept)
+        """
+        self.result_ttl = result_ttl
+        self._calls = {}
+        self._completed = {}
+        self._lock = threading.Lock()
+
+    def _prune_completed(self, now):
+        """Forget expired results. Caller holds _lock."""
+        for key in [k for k, (expires_at, _) in self._completed.items() if expires_at <= now]:
+            del self._completed[key]
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs), or reuse the identical call in flight or recently completed.
+
+        Args:
+            key (hashable): Identifies identical requests
+            fn (callable): Function to run
+
+        Returns:
+            tuple: (result, shared) - shared is True if this caller reused another caller's execution
+
+        Raises:
+            Exception: Whatever fn raised (re-raised to every waiting caller; errors are not kept)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._prune_completed(now)
+            if key in self._completed:
+                return self._completed[key][1], True
+
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+
+        if not leader:
+            call["done"].wait()
+        else:
+            try:
+                call["result"] = fn(*args, **kwargs)
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if call["error"] is None and self.result_ttl > 0:
+                        self._completed[key] = (time.monotonic() + self.result_ttl, call["result"])
+                call["done"].set()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"], not leader
@@ -0,0 +1,217 @@
+"""
+Session recorder for offline replay.
+
+Records each run_agent turn - user message, conversation history, every model
+response and every tool call with the content sent back to the model - as one
+line in a gzip-compressed JSONL file. replay.py runs these sessions against a
+new build.
+
+Recording is off unless PHARMACY_RECORD_DIR is set:
+    PHARMACY_RECORD_DIR=recordings PHARMACY_RECORD_SALT=<secret> streamlit run app.py
+Files are named sessions-YYYYMMDD.jsonl.gz (one per day, appended to).
+
+Personal data is not written:
+- The user's ID number is stored only as a salted SHA-256 hash (id_hash);
+  replay.py maps it back to a user from the local database. Nothing is
+  recorded unless PHARMACY_RECORD_SALT is set to a secret - 9-digit ID
+  numbers are easy to brute-force from an unsalted hash
+- The user's ID number and name are replaced with "[redacted]" everywhere else
+  (messages, history, model responses)
+- Leaflet results (get_medication_profile) are stored as a hash of the content
+  sent to the model, which is enough to detect a divergence on replay
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+RECORD_DIR = os.getenv("PHARMACY_RECORD_DIR")
+RECORD_SALT = os.getenv("PHARMACY_RECORD_SALT", "")
+
+# Tools whose results are recorded as a hash only
+HASHED_CONTENT_TOOLS = {"get_medication_profile"}
+
+REDACTED = "[redacted]"
+
+logger = logging.getLogger(__name__)
+
+# Set once the "no salt" warning has been logged
+_salt_warning_logged = False
+
+_write_lock = threading.Lock()
+
+
+def _to_dict(obj):
+    """Convert an OpenAI object (Pydantic model) to a plain dict."""
+    if isinstance(obj, dict):
+        return obj
+    return obj.model_dump() if hasattr(obj, "model_dump") else {}
+
+
+def hash_id_number(id_number):
+    """Salted SHA-256 of an ID number (hex)."""
+    return hashlib.sha256(f"{RECORD_SALT}:{id_number}".encode("utf-8")).hexdigest()
+
+
+def hash_content(content):
+    """SHA-256 of a tool result as sent to the model (hex)."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def _identifier_pattern(verified_user):
+    """Regex matching the user's ID number and names as whole words (None if no user)."""
+    if not verified_user:
+        return None
+
+    identifiers = [
+        str(verified_user.get(field)) for field in ("id_number", "first_name", "last_name")
+        if verified_user.get(field)
+    ]
+    if not identifiers:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(i) for i in identifiers) + r")\b")
+
+
+def _redact_history_message(msg):
+    """Copy of a history message with leaflet tool results replaced by their hash."""
+    msg = dict(_to_dict(msg))
+    if msg.get("role") == "tool" and msg.get("name") in HASHED_CONTENT_TOOLS:
+        msg["content"] = f"{REDACTED} sha256:{hash_content(msg.get('content'))}"
+    return msg
+
+
+def start_session(user_message, verified_user, conversation_history):
+    """
+    Start recording one run_agent turn.
+
+    Args:
+        user_message (str): The user's message
+        verified_user (dict): Current verified user information
+        conversation_history (list): Previous conversation messages
+
+    Returns:
+        dict: Session being recorded, or None if recording is off (or no salt is set)
+    """
+    global _salt_warning_logged
+
+    if not RECORD_DIR:
+        return None
+
+    if not RECORD_SALT:
+        if not _salt_warning_logged:
+            _salt_warning_logged = True
+            logger.warning("PHARMACY_RECORD_DIR is set but PHARMACY_RECORD_SALT is not - sessions are not recorded")
+        return None
+
+    return {
+        "session_id": uuid.uuid4().hex,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "verified_user": {"id_hash": hash_id_number(verified_user["id_number"])} if verified_user else None,
+        "user_message": user_message,
+        "history": [_redact_history_message(msg) for msg in conversation_history],
+        "model_calls": [],
+        "tool_calls": [],
+        "final_response": None,
+        "_identifiers": _identifier_pattern(verified_user),
+        "_start": time.perf_counter()
+    }
+
+
+def record_model_response(session, model, latency, response):
+    """
+    Record one model response.
+
+    Args:
+        session (dict): Session from start_session (None = not recording)
+        model (str): Model that was called
+        latency (float): Call duration in seconds
+        response: OpenAI ChatCompletion
+    """
+    if session is None:
+        return
+
+    session["model_calls"].append({
+        "model": model,
+        "latency_ms": round(latency * 1000, 1),
+        "response": _to_dict(response)
+    })
+
+
+def record_tool_call(session, tool_name, arguments, content):
+    """
+    Record one tool call and the content returned to the model (or its hash, for leaflet results).
+
+    Args:
+        session (dict): Session from start_session (None = not recording)
+        tool_name (str): Tool that was called
+        arguments (dict): Tool arguments
+        content (str): Encoded tool result as added to the conversation
+    """
+    if session is None:
+        return
+
+    if tool_name in HASHED_CONTENT_TOOLS:
+        recorded = {"content_sha256": hash_content(content)}
+    else:
+        recorded = {"content": content}
+
+    session["tool_calls"].append(dict({"name": tool_name, "arguments": arguments}, **recorded))
+
+
+def finish_session(session, final_response):
+    """
+    Write a finished session to today's recording file.
+
+    Args:
+        session (dict): Session from start_session (None = not recording)
+        final_response (str): The agent's final response
+    """
+    if session is None:
+        return
+
+    session["final_response"] = final_response
+    session["duration_ms"] = round((time.perf_counter() - session.pop("_start")) * 1000, 1)
+    identifiers = session.pop("_identifiers")
+
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    path = os.path.join(RECORD_DIR, f"sessions-{datetime.now(timezone.utc):%Y%m%d}.jsonl.gz")
+    line = json.dumps(session, ensure_ascii=False, default=str)
+
+    # ID numbers and names contain no JSON metacharacters, so the line stays valid JSON
+    if identifiers is not None:
+        line = identifiers.sub(REDACTED, line)
+    line += "\n"
+
+    # Each append adds a gzip member; readers see one continuous stream
+    with _write_lock:
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write(line)
+
+
+def load_sessions(paths):
+    """
+    Read recorded sessions.
+
+    Args:
+        paths (list): .jsonl.gz (or plain .jsonl) recording files
+
+    Returns:
+        list: Session dicts in file order
+    """
+    sessions = []
+
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    sessions.append(json.loads(line))
+
+    return sessions
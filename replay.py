@@ -0,0 +1,260 @@
+"""
+Offline replay and load test driven by recorded sessions.
+
+Replays sessions written by recorder.py against the current build. The model
+is mocked: each session gets a scripted model that returns the recorded
+responses in order, while tool calls run for real against the local database.
+Reports throughput, latency percentiles and divergences in what the current
+build produces:
+- content: a tool result sent to the model differs from the recording (tool
+  code, shaping or data changed)
+- model: routing picked a different model for a call
+- missing call: the turn ended with more or fewer model/tool calls
+
+Tool names and arguments are not compared - they come from the recorded model
+responses, so a replay always repeats them.
+
+Usage:
+    python replay.py recordings/sessions-*.jsonl.gz --concurrency 8
+    python replay.py recordings/*.jsonl.gz --repeat 20 --latency-scale 1.0   # load test
+"""
+
+import argparse
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai.types.chat import ChatCompletion
+
+import agent
+import audit
+import catalog
+import recorder
+from llm_client import LLMUnavailableError, percentile
+
+# Divergences printed in the report
+MAX_DIVERGENCES_SHOWN = 10
+
+
+class ScriptedLLM:
+    """Mocked model that returns a session's recorded responses in order."""
+
+    def __init__(self, model_calls, latency_scale=0.0):
+        """
+        Args:
+            model_calls (list): Recorded model calls from the session
+            latency_scale (float): Sleep for recorded latency x scale (0 = no delay)
+        """
+        self._model_calls = model_calls
+        self._latency_scale = latency_scale
+        self._index = 0
+        self.requested_models = []
+
+    def create(self, deadline=None, **kwargs):
+        # The model chosen by the current build's routing
+        self.requested_models.append(kwargs.get("model"))
+
+        if self._index >= len(self._model_calls):
+            raise LLMUnavailableError("Recorded script exhausted - the new build made more model calls")
+
+        model_call = self._model_calls[self._index]
+        self._index += 1
+
+        if self._latency_scale:
+            time.sleep(model_call["latency_ms"] / 1000 * self._latency_scale)
+
+        return ChatCompletion.model_validate(model_call["response"])
+
+
+def load_user_index(db_path="pharmacy.db"):
+    """
+    Map recorded ID hashes back to users in the local database.
+
+    Returns:
+        dict: id_hash -> {"id_number", "first_name", "last_name"}
+    """
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('SELECT id_number, first_name, last_name FROM users').fetchall()
+
+    return {
+        recorder.hash_id_number(id_number): {"id_number": id_number, "first_name": first_name, "last_name": last_name}
+        for id_number, first_name, last_name in rows
+    }
+
+
+def find_model_divergences(recorded_model_calls, requested_models):
+    """
+    Compare the models the current build routed to with the recording.
+
+    Args:
+        recorded_model_calls (list): Recorded model calls ({"model", ...})
+        requested_models (list): Models requested from ScriptedLLM during the replay
+
+    Returns:
+        list: [{"index", "field", "recorded", "replayed"}]
+    """
+    return [
+        {"index": i, "field": "model", "recorded": recorded["model"], "replayed": requested}
+        for i, (recorded, requested) in enumerate(zip(recorded_model_calls, requested_models))
+        if recorded["model"] != requested
+    ]
+
+
+def find_divergences(recorded_calls, replayed_calls):
+    """
+    Compare the tool results of a replay with the recording.
+
+    Only the content sent to the model is compared (or its hash, for tools the
+    recorder stores hashed). Names and arguments come from the recorded model
+    responses, so they cannot differ; a different number of calls is reported
+    as "missing call".
+
+    Args:
+        recorded_calls (list): [{"name", "arguments", "content" or "content_sha256"}] from the recording
+        replayed_calls (list): [{"name", "arguments", "result"}] from extract_tool_calls_from_messages
+
+    Returns:
+        list: [{"index", "field", "recorded", "replayed"}]
+    """
+    divergences = []
+
+    for i in range(max(len(recorded_calls), len(replayed_calls))):
+        if i >= len(recorded_calls) or i >= len(replayed_calls):
+            divergences.append({
+                "index": i,
+                "field": "missing call",
+                "recorded": recorded_calls[i]["name"] if i < len(recorded_calls) else None,
+                "replayed": replayed_calls[i]["name"] if i < len(replayed_calls) else None
+            })
+            continue
+
+        recorded, replayed = recorded_calls[i], replayed_calls[i]
+        if "content_sha256" in recorded:
+            recorded_value = recorded["content_sha256"]
+            replayed_value = recorder.hash_content(replayed["result"])
+        else:
+            recorded_value, replayed_value = recorded["content"], replayed["result"]
+
+        if recorded_value != replayed_value:
+            divergences.append({
+                "index": i,
+                "field": f"content ({recorded['name']})",
+                "recorded": recorded_value,
+                "replayed": replayed_value
+            })
+
+    return divergences
+
+
+def replay_session(session, latency_scale=0.0, users=None):
+    """
+    Replay one recorded session.
+
+    Args:
+        session (dict): Session from recorder.load_sessions
+        latency_scale (float): Model latency scale for ScriptedLLM
+        users (dict, optional): id_hash -> user from load_user_index (unknown users replay as anonymous)
+
+    Returns:
+        dict: {"session_id", "latency", "model_calls", "tool_calls", "divergences"}
+    """
+    llm = ScriptedLLM(session["model_calls"], latency_scale)
+
+    recorded_user = session["verified_user"]
+    verified_user = (users or {}).get(recorded_user["id_hash"]) if recorded_user else None
+
+    start = time.perf_counter()
+    _, updated_history, _ = agent.run_agent(
+        session["user_message"],
+        verified_user,
+        session["history"],
+        llm=llm
+    )
+    latency = time.perf_counter() - start
+
+    # Only this turn's messages: skip system message, history and user message
+    turn_messages = updated_history[len(session["history"]) + 2:]
+    replayed_calls = agent.extract_tool_calls_from_messages(turn_messages)
+
+    return {
+        "session_id": session["session_id"],
+        "latency": latency,
+        "model_calls": llm._index,
+        "tool_calls": len(replayed_calls),
+        "divergences": (find_model_divergences(session["model_calls"], llm.requested_models)
+                        + find_divergences(session["tool_calls"], replayed_calls))
+    }
+
+
+def run_replay(sessions, concurrency=4, repeat=1, latency_scale=0.0):
+    """
+    Replay sessions concurrently.
+
+    Args:
+        sessions (list): Recorded sessions
+        concurrency (int): Sessions replayed in parallel
+        repeat (int): Times each session is replayed (load testing)
+        latency_scale (float): Model latency scale for ScriptedLLM
+
+    Returns:
+        dict: {"sessions", "wall_time", "throughput", "p50", "p95", "p99", "max",
+               "model_calls", "tool_calls", "divergent_sessions", "divergences"}
+    """
+    # Replays must not write to the audit log or record themselves
+    audit.AUDIT_ENABLED = False
+    recorder.RECORD_DIR = None
+
+    # Routing needs the medication names the recording build had, or small-model calls diverge
+    catalog.load_snapshot(catalog.SNAPSHOT_PATH)
+    users = load_user_index()
+    work = [session for session in sessions for _ in range(repeat)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda s: replay_session(s, latency_scale, users), work))
+    wall_time = time.perf_counter() - start
+
+    latencies = [r["latency"] for r in results]
+    divergent = [r for r in results if r["divergences"]]
+
+    return {
+        "sessions": len(results),
+        "wall_time": wall_time,
+        "throughput": len(results) / wall_time if wall_time else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+        "model_calls": sum(r["model_calls"] for r in results),
+        "tool_calls": sum(r["tool_calls"] for r in results),
+        "divergent_sessions": len(divergent),
+        "divergences": [
+            dict(d, session_id=r["session_id"]) for r in divergent for d in r["divergences"]
+        ]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded sessions against the current build")
+    parser.add_argument("paths", nargs="+", help="Recording files (.jsonl.gz)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each session N times")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="Simulate recorded model latency x scale (0 = no model latency)")
+    args = parser.parse_args()
+
+    sessions = recorder.load_sessions(args.paths)
+    report = run_replay(sessions, args.concurrency, args.repeat, args.latency_scale)
+
+    print(f"Replayed {report['sessions']} sessions ({len(sessions)} recorded x {args.repeat}) "
+          f"at concurrency {args.concurrency}")
+    print(f"Wall time: {report['wall_time']:.2f}s, throughput: {report['throughput']:.1f} sessions/s")
+    print(f"Latency p50: {report['p50'] * 1000:.1f} ms, p95: {report['p95'] * 1000:.1f} ms, "
+          f"p99: {report['p99'] * 1000:.1f} ms, max: {report['max'] * 1000:.1f} ms")
+    print(f"Model calls: {report['model_calls']}, tool calls: {report['tool_calls']}")
+    print(f"Sessions with divergences: {report['divergent_sessions']}/{report['sessions']} "
+          f"(tool result content, routed model, call count - names and arguments are replayed from the recording)")
+
+    for d in report["divergences"][:MAX_DIVERGENCES_SHOWN]:
+        print(f"  {d['session_id']} call #{d['index']} {d['field']}: "
+              f"recorded={d['recorded']!r} replayed={d['replayed']!r}")
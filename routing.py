@@ -0,0 +1,370 @@
+"""
+Adaptive model routing.
+
+Plain lookups - a price/stock question about a medication from the catalog
+snapshot and nothing else - are sent to a small, fast model. Everything else
+(advice, dosage, unknown medications, multi-part or multi-step requests) goes
+to the large model.
+
+Configuration (environment variables):
+    PHARMACY_ROUTING      - "adaptive" (default), "large" or "small"
+    PHARMACY_SMALL_MODEL  - Model for simple turns (default "gpt-5-mini")
+    PHARMACY_LARGE_MODEL  - Model for everything else (default "gpt-5")
+
+Run `python routing.py` for an offline evaluation over the documented test cases.
+"""
+
+import os
+import json
+import re
+import threading
+
+import catalog
+
+ROUTING_MODE = os.getenv("PHARMACY_ROUTING", "adaptive")
+
+MODELS = {
+    "small": os.getenv("PHARMACY_SMALL_MODEL", "gpt-5-mini"),
+    "large": os.getenv("PHARMACY_LARGE_MODEL", "gpt-5")
+}
+
+# USD per 1M tokens (input, output) - used for cost estimates only
+MODEL_PRICES = {
+    "gpt-5": (1.25, 10.00),
+    "gpt-5-mini": (0.25, 2.00)
+}
+
+# Keywords that mark a plain lookup (stock / price) - whole words or phrases
+LOOKUP_KEYWORDS = [
+    "price", "cost", "costs", "how much", "stock", "available", "availability", "branch", "branches", "store",
+    "מחיר", "עולה", "עולים", "מלאי", "במלאי", "זמין", "זמינה", "סניף", "סניפים"
+]
+
+# Words a plain lookup may contain besides lookup keywords and the medication name
+LOOKUP_FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "it", "its", "what", "whats", "what's", "how", "much", "do", "does",
+    "you", "your", "in", "at", "of", "for", "there", "any", "have", "has", "please", "and",
+    "יש", "כמה", "מה", "של", "את", "האם", "זה"
+}
+
+# One-letter Hebrew prefixes (in, to, the, and, from, that) stripped when matching words
+HEBREW_PREFIXES = "בלהומש"
+
+# Keywords that need careful handling (dosage, prescriptions, advice, alternatives)
+ESCALATE_KEYWORDS = [
+    "dosage", "dose", "how to take", "usage", "ingredient", "prescription",
+    "recommend", "should i", "best", "which medication", "side effect", "alternative", "equivalent", "instead",
+    "מינון", "הוראות", "שימוש", "רכיב", "מרשם", "ממליץ", "כדאי", "טוב ל", "איזה תרופה", "תופעות", "תחליף", "חלופ"
+]
+
+# Longer messages are usually multi-part questions
+MAX_SIMPLE_MESSAGE_LENGTH = 80
+
+# After this many model calls in one turn, the request is clearly multi-step
+MAX_SIMPLE_ITERATIONS = 3
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def _message_field(msg, field):
+    """Read a field from a dict message or an OpenAI message object."""
+    if isinstance(msg, dict):
+        return msg.get(field)
+    return getattr(msg, field, None)
+
+
+def _word_matches(word, vocabulary):
+    """Match a word against a vocabulary, also without a Hebrew one-letter prefix."""
+    return word in vocabulary or (len(word) > 2 and word[0] in HEBREW_PREFIXES and word[1:] in vocabulary)
+
+
+def classify_user_message(text, medication_names=None):
+    """
+    Decide which model a user message needs.
+
+    Small only for a plain lookup: a lookup keyword, a known medication name and
+    nothing else (filler words aside). Everything else defaults to large.
+
+    Args:
+        text (str): The user's message
+        medication_names (set, optional): Known names (default: catalog snapshot)
+
+    Returns:
+        tuple: (route, reason) - route is "small" or "large"
+    """
+    lowered = (text or "").lower()
+
+    if any(keyword in lowered for keyword in ESCALATE_KEYWORDS):
+        return "large", "dosage/advice/prescription question"
+
+    if len(lowered) > MAX_SIMPLE_MESSAGE_LENGTH:
+        return "large", "long message"
+
+    if medication_names is None:
+        # Loads the catalog snapshot on first use
+        medication_names = catalog.medication_names()
+
+    words = re.findall(r"[\w']+", lowered)
+    joined = f" {' '.join(words)} "
+    keywords = [keyword for keyword in LOOKUP_KEYWORDS if f" {keyword} " in joined]
+    if not keywords:
+        return "large", "not a price/stock lookup"
+
+    keyword_words = {word for keyword in keywords for word in keyword.split()}
+    medications = [word for word in words if _word_matches(word, medication_names)]
+    if not medications:
+        return "large", "no known medication"
+
+    other_words = [
+        word for word in words
+        if word not in keyword_words
+        and not _word_matches(word, medication_names)
+        and not _word_matches(word, LOOKUP_FILLER_WORDS)
+    ]
+    if other_words:
+        return "large", "more than a price/stock lookup"
+
+    return "small", "price/stock lookup"
+
+
+def choose_route(messages):
+    """
+    Pick the model for the next call in run_agent.
+
+    Args:
+        messages (list): The conversation so far (system, history, user, tool results)
+
+    Returns:
+        dict: {"route": "small" | "large", "model": str, "reason": str}
+    """
+    if ROUTING_MODE in MODELS:
+        return {"route": ROUTING_MODE, "model": MODELS[ROUTING_MODE], "reason": "fixed routing"}
+
+    # Find the current user message and everything that happened after it
+    last_user_index = 0
+    for i, msg in enumerate(messages):
+        if _message_field(msg, "role") == "user":
+            last_user_index = i
+
+    route, reason = classify_user_message(_message_field(messages[last_user_index], "content"))
+    turn_messages = messages[last_user_index + 1:]
+
+    if route == "small":
+        model_calls = sum(1 for msg in turn_messages if _message_field(msg, "role") == "assistant")
+
+        for msg in turn_messages:
+            if _message_field(msg, "role") != "tool":
+                continue
+
+            try:
+                result = json.loads(_message_field(msg, "content") or "{}")
+            except ValueError:
+                result = {}
+
+            # Errors and unknown medications (possible typos) need the large model
+            if result.get("error"):
+                route, reason = "large", "tool error"
+            elif result.get("found") is False:
+                route, reason = "large", "medication not found"
+
+        if model_calls >= MAX_SIMPLE_ITERATIONS:
+            route, reason = "large", "multi-step request"
+
+    return {"route": route, "model": MODELS[route], "reason": reason}
+
+
+def estimate_cost(model, usage):
+    """
+    Estimate the cost of one call in USD.
+
+    Args:
+        model (str): Model name
+        usage: OpenAI usage object or dict with prompt_tokens / completion_tokens
+
+    Returns:
+        float: Estimated cost (0.0 if the model or usage is unknown)
+    """
+    if usage is None or model not in MODEL_PRICES:
+        return 0.0
+
+    prompt_tokens = _message_field(usage, "prompt_tokens") or 0
+    completion_tokens = _message_field(usage, "completion_tokens") or 0
+    input_price, output_price = MODEL_PRICES[model]
+
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def record_call(route, model, latency, usage=None):
+    """
+    Record latency, token usage and cost for one routed call.
+
+    Args:
+        route (str): "small" or "large"
+        model (str): Model that served the call
+        latency (float): Call duration in seconds
+        usage: OpenAI usage object (optional)
+    """
+    with _lock:
+        stats = _stats.setdefault(route, {
+            "model": model,
+            "calls": 0,
+            "total_latency": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost_usd": 0.0
+        })
+
+        stats["calls"] += 1
+        stats["total_latency"] += latency
+        if usage is not None:
+            stats["prompt_tokens"] += _message_field(usage, "prompt_tokens") or 0
+            stats["completion_tokens"] += _message_field(usage, "completion_tokens") or 0
+        stats["cost_usd"] += estimate_cost(model, usage)
+
+
+def get_routing_stats():
+    """
+    Report per-route metrics.
+
+    Returns:
+        dict: route -> {"model", "calls", "avg_latency", "prompt_tokens",
+                        "completion_tokens", "cost_usd"}
+    """
+    with _lock:
+        report = {}
+        for route, stats in _stats.items():
+            report[route] = {
+                "model": stats["model"],
+                "calls": stats["calls"],
+                "avg_latency": stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0,
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+                "cost_usd": round(stats["cost_usd"], 6)
+            }
+        return report
+
+
+# Test cases from EVALUATION_PLAN.md with the route each step should take.
+# Each step is the conversation after the user message (tool results so far).
+EVALUATION_CASES = [
+    {
+        "name": "TC1: Non-prescription price/stock",
+        "message": "יש אקמול? כמה עולה?",
+        "steps": [
+            ([], "small"),
+            ([{"name": "medication_exists", "result": {"found": True, "medication": {"id": 1}}}], "small"),
+            ([{"name": "medication_exists", "result": {"found": True, "medication": {"id": 1}}},
+              {"name": "get_medication_availability", "result": {"found": True, "in_stock": True, "price": 25.9}}], "small")
+        ]
+    },
+    {
+        "name": "TC2: Prescription dosage, no authorization",
+        "message": "מה המינון של אוגמנטין?",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "TC3: Prescription dosage and price, authorized",
+        "message": "מה המינון והמחיר של אוגמנטין?",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "TC4: Medical advice request",
+        "message": "איזה תרופה טובה לכאב ראש?",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "TC5: Medication not found",
+        "message": "יש XYZ123 במלאי?",
+        "steps": [
+            ([], "large"),
+            ([{"name": "medication_exists", "result": {"found": False, "medication": None}}], "large")
+        ]
+    },
+    {
+        "name": "Plain lookup (English)",
+        "message": "how much does Advil cost?",
+        "steps": [([], "small")]
+    },
+    {
+        "name": "Advice phrased as a stock question",
+        "message": "do you have anything for a headache?",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "Symptom with bare 'יש'",
+        "message": "יש לי חום, מה לקחת?",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "Safety question plus price",
+        "message": "Is Advil safe with alcohol? how much is it",
+        "steps": [([], "large")]
+    },
+    {
+        "name": "Price plus pediatric question",
+        "message": "what does Acamol cost and can I give it to my 2 year old",
+        "steps": [([], "large")]
+    }
+]
+
+
+def _build_messages(user_message, tool_results):
+    """Build a synthetic conversation for offline evaluation."""
+    messages = [{"role": "system", "content": ""}, {"role": "user", "content": user_message}]
+
+    for i, tool in enumerate(tool_results):
+        messages.append({"role": "assistant", "content": None, "tool_calls": [{"id": f"call_{i}"}]})
+        messages.append({
+            "role": "tool",
+            "tool_call_id": f"call_{i}",
+            "name": tool["name"],
+            "content": json.dumps(tool["result"])
+        })
+
+    return messages
+
+
+def evaluate_offline(cases=EVALUATION_CASES):
+    """
+    Check the routing policy against the documented test cases (no API calls).
+
+    Returns:
+        dict: {"total": int, "correct": int, "results": list of per-step dicts}
+    """
+    results = []
+
+    for case in cases:
+        for step, (tool_results, expected) in enumerate(case["steps"], 1):
+            decision = choose_route(_build_messages(case["message"], tool_results))
+            results.append({
+                "case": case["name"],
+                "step": step,
+                "expected": expected,
+                "route": decision["route"],
+                "reason": decision["reason"],
+                "correct": decision["route"] == expected
+            })
+
+    return {
+        "total": len(results),
+        "correct": sum(1 for r in results if r["correct"]),
+        "results": results
+    }
+
+
+if __name__ == "__main__":
+    # Medication names come from the catalog snapshot written by init_db.py
+    if not catalog.medication_names():
+        print(f"{catalog.SNAPSHOT_PATH} not found - run init_db.py first (every lookup will route to large)\n")
+
+    evaluation = evaluate_offline()
+
+    print(f"Routing mode: {ROUTING_MODE} (small={MODELS['small']}, large={MODELS['large']})\n")
+    for r in evaluation["results"]:
+        status = "PASS" if r["correct"] else "FAIL"
+        print(f"[{status}] {r['case']} - step {r['step']}: {r['route']} (expected {r['expected']}, {r['reason']})")
+
+    small_steps = sum(1 for r in evaluation["results"] if r["route"] == "small")
+    print(f"\n{evaluation['correct']}/{evaluation['total']} steps routed as expected")
+    print(f"{small_steps}/{evaluation['total']} steps routed to the small model")
@@ -0,0 +1,75 @@
+"""
+Compact tool result encoding.
+
+Tool results are added to the conversation and resent to the model on every
+later iteration, so every key counts. This module:
+- Projects results to the fields the model asked for (the optional `fields` tool argument)
+- Drops null values and redundant defaults (`found: true`, `has_prescription: null`)
+- Encodes JSON with compact separators and raw UTF-8 (Hebrew is not \\u-escaped)
+"""
+
+import json
+
+# Fields the model may request via the `fields` argument, per tool.
+# Anything else (found, error, message, can_access, requires_prescription)
+# carries status or access decisions and is never projected away.
+PROJECTABLE_FIELDS = {
+    "get_medication_availability": ["in_stock", "stock_quantity", "price"],
+    "get_medication_profile": ["active_ingredients", "dosage_instructions", "usage_instructions", "factual_info"]
+}
+
+
+def _drop_nulls(value):
+    """Recursively remove null values from nested dicts and lists."""
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(v) for v in value]
+    return value
+
+
+def shape_result(tool_name, result, fields=None):
+    """
+    Reduce a tool result to what the model needs.
+
+    Args:
+        tool_name (str): Name of the tool that produced the result
+        result (dict): Raw result from execute_tool_call
+        fields (list, optional): Fields requested by the model (None = all fields)
+
+    Returns:
+        dict: Shaped result
+    """
+    projectable = PROJECTABLE_FIELDS.get(tool_name)
+    requested = set(fields) & set(projectable) if (fields and projectable) else None
+
+    shaped = {}
+    for key, value in result.items():
+        # Null values carry no information
+        if value is None:
+            continue
+
+        # found=true is implied by the presence of data; only found=false is kept
+        if key == "found" and value is True:
+            continue
+
+        # Field projection - status fields are always kept
+        if requested and key in projectable and key not in requested:
+            continue
+
+        shaped[key] = _drop_nulls(value)
+
+    return shaped
+
+
+def encode_result(result):
+    """
+    Serialize a tool result for the conversation.
+
+    Args:
+        result (dict): Shaped tool result
+
+    Returns:
+        str: Compact JSON string
+    """
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
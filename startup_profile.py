@@ -0,0 +1,107 @@
+"""
+Startup profile report.
+
+Measures what a fresh process pays before it can answer the first request:
+- Import time of each project module (cold, in a separate interpreter)
+- The slowest imports underneath them (from `python -X importtime`)
+- First-use initialization: catalog snapshot load and OpenAI client creation
+
+Usage:
+    python startup_profile.py
+"""
+
+import subprocess
+import sys
+import time
+
+# Modules imported by app.py, directly or indirectly
+PROJECT_MODULES = [
+    "database", "tools", "catalog", "prefetch", "routing", "shaping", "llm_client",
+    "audit", "recorder", "ratelimit", "agent"
+]
+
+# Heavy modules that should only be imported when first needed
+HEAVY_MODULES = ["openai", "dotenv", "streamlit"]
+
+TOP_IMPORTS = 10
+
+
+def profile_import(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Module name
+
+    Returns:
+        dict: {
+            "module": str,
+            "total_ms": float (cumulative import time of the module),
+            "imports": list of (name, self_ms, cumulative_ms),
+            "loaded_heavy": list of heavy modules pulled in by the import
+        }
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True, text=True
+    )
+
+    imports = []
+    for line in completed.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+
+    total_ms = next((cumulative for name, _, cumulative in imports if name == module), 0.0)
+    loaded_heavy = [m for m in completed.stdout.strip().split(",") if m]
+
+    return {"module": module, "total_ms": total_ms, "imports": imports, "loaded_heavy": loaded_heavy}
+
+
+def profile_first_use():
+    """
+    Time first-use initialization in this process.
+
+    Returns:
+        dict: step name -> milliseconds
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    import catalog
+    medications = catalog.load_snapshot()
+    timings[f"catalog.load_snapshot() ({medications} medications)"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    import agent
+    try:
+        agent.get_client()
+        timings["agent.get_client() (imports openai, dotenv)"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        timings[f"agent.get_client() failed ({type(e).__name__})"] = (time.perf_counter() - start) * 1000
+
+    return timings
+
+
+if __name__ == "__main__":
+    print("Import time per module (cold interpreter, cumulative):\n")
+
+    agent_profile = None
+    for module in PROJECT_MODULES:
+        profile = profile_import(module)
+        heavy = ", ".join(profile["loaded_heavy"]) or "-"
+        print(f"  {module:<12} {profile['total_ms']:>8.1f} ms   heavy modules loaded: {heavy}")
+        if module == "agent":
+            agent_profile = profile
+
+    print(f"\nSlowest imports under `agent` (top {TOP_IMPORTS} by self time):\n")
+    for name, self_ms, cumulative_ms in sorted(agent_profile["imports"], key=lambda i: -i[1])[:TOP_IMPORTS]:
+        print(f"  {name:<40} self {self_ms:>7.1f} ms   cumulative {cumulative_ms:>7.1f} ms")
+
+    print("\nFirst-use initialization (done once per process by app.warm_up):\n")
+    for step, ms in profile_first_use().items():
+        print(f"  {step:<50} {ms:>8.1f} ms")
@@ -0,0 +1,127 @@
+"""
+Tests for audit.py backpressure.
+
+Run with: python -m pytest -q
+"""
+
+import queue
+import sqlite3
+
+import pytest
+
+import audit
+
+
+@pytest.fixture
+def stalled_audit(tmp_path, monkeypatch):
+    """A tiny audit queue with no writer draining it."""
+    monkeypatch.setattr(audit, "AUDIT_ENABLED", True)
+    monkeypatch.setattr(audit, "AUDIT_DB_PATH", str(tmp_path / "audit.db"))
+    monkeypatch.setattr(audit, "AUDIT_QUEUE_MAX", 4)
+    monkeypatch.setattr(audit, "AUDIT_RESERVED_CAPACITY", 2)
+    monkeypatch.setattr(audit, "AUDIT_CRITICAL_PUT_TIMEOUT", 0.05)
+    monkeypatch.setattr(audit, "_queue", queue.Queue(maxsize=4))
+    monkeypatch.setattr(audit, "_ensure_writer", lambda: None)
+    return audit
+
+
+def audit_rows(event_type):
+    with sqlite3.connect(audit.AUDIT_DB_PATH) as conn:
+        return conn.execute('SELECT COUNT(*) FROM audit_log WHERE event_type = ?', (event_type,)).fetchone()[0]
+
+
+def test_tool_calls_leave_reserved_capacity(stalled_audit):
+    results = [stalled_audit.log_event("tool_call", "123456789", "medication_exists") for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert stalled_audit._queue.qsize() == 2
+
+
+def test_access_decisions_are_never_dropped(stalled_audit):
+    for _ in range(2):
+        stalled_audit.log_event("tool_call", "123456789", "get_medication_profile")
+
+    # Two fit in the reserved slots, the third is written synchronously
+    results = [
+        stalled_audit.log_event("access_decision", "123456789", "get_medication_profile", 3, "denied")
+        for _ in range(3)
+    ]
+
+    assert results == [True, True, True]
+    assert stalled_audit._queue.qsize() == 4
+    assert audit_rows("access_decision") == 1
+
+
+class FlakyConnection:
+    """sqlite3 connection whose first `failures` inserts fail with 'database is locked'."""
+
+    def __init__(self, conn, failures):
+        self._conn = conn
+        self.failures = failures
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def executemany(self, sql, rows):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.executemany(sql, rows)
+
+
+@pytest.fixture
+def flaky_writer(tmp_path, monkeypatch):
+    """A real background writer whose database fails the first N inserts."""
+    monkeypatch.setattr(audit, "AUDIT_ENABLED", True)
+    monkeypatch.setattr(audit, "AUDIT_DB_PATH", str(tmp_path / "audit.db"))
+    monkeypatch.setattr(audit, "AUDIT_RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(audit, "AUDIT_FLUSH_INTERVAL", 0.05)
+    monkeypatch.setattr(audit, "_queue", queue.Queue(maxsize=audit.AUDIT_QUEUE_MAX))
+    monkeypatch.setattr(audit, "_writer", None)
+
+    connections = []
+    real_connect = audit._connect
+
+    def start(failures):
+        def connect():
+            connections.append(FlakyConnection(real_connect(), failures))
+            return connections[-1]
+        monkeypatch.setattr(audit, "_connect", connect)
+
+    yield start
+    audit.shutdown()
+
+
+def test_failed_write_is_retried(flaky_writer):
+    flaky_writer(failures=1)
+    audit.log_event("tool_call", "123456789", "medication_exists")
+    audit.log_event("access_decision", "123456789", "get_medication_profile", 3, "denied")
+
+    assert audit.flush()
+    assert audit_rows("tool_call") == 1
+    assert audit_rows("access_decision") == 1
+
+
+def test_access_decision_survives_a_batch_that_keeps_failing(flaky_writer, monkeypatch):
+    # Every attempt for the first batch fails
+    flaky_writer(failures=audit.AUDIT_WRITE_RETRIES + 1)
+    dropped = audit.get_audit_stats()["dropped"]
+
+    # Queue both events before the writer starts, so they are written as one batch
+    ensure_writer = audit._ensure_writer
+    monkeypatch.setattr(audit, "_ensure_writer", lambda: None)
+    audit.log_event("tool_call", "123456789", "get_medication_profile")
+    audit.log_event("access_decision", "123456789", "get_medication_profile", 3, "denied")
+    ensure_writer()
+
+    assert audit.flush()
+    assert audit.get_audit_stats()["errors"] >= audit.AUDIT_WRITE_RETRIES + 1
+    assert audit_rows("access_decision") == 1
+    assert audit_rows("tool_call") == 0
+    assert audit.get_audit_stats()["dropped"] == dropped + 1
@@ -0,0 +1,54 @@
+"""
+Tests for database.py.
+
+Run with: python -m pytest -q
+"""
+
+import sqlite3
+
+import pytest
+
+import init_db
+from database import (
+    get_medication_availability, get_branch_availability, find_equivalent_medications,
+    MAX_BRANCH_RESULTS
+)
+
+ACAMOL, ADVIL, NUROFEN = 1, 4, 5
+
+
+@pytest.fixture(autouse=True)
+def pharmacy(tmp_path, monkeypatch, capsys):
+    """Seeded database in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    init_db.init_database()
+    capsys.readouterr()
+
+
+def set_branch_quantities(medication_id, quantity):
+    with sqlite3.connect('pharmacy.db') as conn:
+        conn.execute('UPDATE branch_inventory SET quantity = ? WHERE medication_id = ?', (quantity, medication_id))
+
+
+def test_stock_is_the_sum_of_branch_inventory():
+    assert get_medication_availability(ACAMOL)["stock_quantity"] == 150
+
+    set_branch_quantities(NUROFEN, 0)
+
+    assert get_medication_availability(NUROFEN)["in_stock"] is False
+    assert get_branch_availability(NUROFEN)["branches"] == []
+    assert find_equivalent_medications(ADVIL)["alternatives"] == []
+
+
+@pytest.mark.parametrize("branch_name", ["Tel Aviv", "tel aviv", "תל אביב", "ירושלים", "חיפה"])
+def test_branch_lookup_by_english_or_hebrew_city(branch_name):
+    result = get_branch_availability(ACAMOL, branch_name)
+
+    assert result["found"] is True
+    assert result["branches"][0]["distance_km"] == 0.0
+
+
+@pytest.mark.parametrize("limit, expected", [(-1, 1), (0, 1), (2, 2), (100, 6), ("abc", 5), (None, 5), ("3", 3)])
+def test_branch_limit_is_clamped(limit, expected):
+    assert MAX_BRANCH_RESULTS >= 6
+    assert len(get_branch_availability(ACAMOL, limit=limit)["branches"]) == expected
@@ -0,0 +1,110 @@
+"""
+Tests for llm_client.py against fake_llm_server.py.
+
+Run with: python -m pytest -q
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import OpenAI
+
+from fake_llm_server import start_fake_server
+from llm_client import ResilientLLMClient, LLMUnavailableError
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+@pytest.fixture
+def server():
+    server = start_fake_server(latency=0.02, slow_latency=1.0)
+    yield server
+    server.shutdown()
+
+
+def make_client(server, **kwargs):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    kwargs.setdefault("base_backoff", 0.01)
+    return ResilientLLMClient(OpenAI(api_key="fake", base_url=base_url), **kwargs)
+
+
+def call(llm, seconds=5.0):
+    return llm.create(deadline=time.monotonic() + seconds, model="fake", messages=MESSAGES)
+
+
+def test_retries_recover_from_server_errors(server):
+    llm = make_client(server, max_retries=3)
+    server.config["fail_next"] = 2
+
+    response = call(llm)
+
+    assert response.choices[0].message.content == "OK"
+    stats = llm.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+    assert stats["circuit_state"] == "closed"
+
+
+def test_retries_exhausted_raises(server):
+    llm = make_client(server, max_retries=1, failure_threshold=10)
+    server.config["fail_next"] = 2
+
+    with pytest.raises(LLMUnavailableError):
+        call(llm)
+    assert server.config["requests"] == 2
+
+
+def test_hedge_fires_and_wins_on_slow_request(server):
+    llm = make_client(server, hedge_min_samples=5)
+    for _ in range(5):
+        call(llm)
+
+    server.config["slow_next"] = 1
+    start = time.monotonic()
+    call(llm)
+    elapsed = time.monotonic() - start
+
+    stats = llm.get_stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    assert elapsed < server.config["slow_latency"]
+
+
+def test_circuit_opens_then_closes(server):
+    llm = make_client(server, max_retries=0, failure_threshold=3, reset_timeout=0.3)
+    server.config["error_rate"] = 1.0
+
+    for _ in range(3):
+        with pytest.raises(LLMUnavailableError):
+            call(llm)
+    assert llm.breaker.state == "open"
+
+    # Open circuit: rejected without reaching the server
+    requests = server.config["requests"]
+    with pytest.raises(LLMUnavailableError, match="Circuit open"):
+        call(llm)
+    assert server.config["requests"] == requests
+
+    # After reset_timeout a trial request succeeds and closes the circuit
+    server.config["error_rate"] = 0.0
+    time.sleep(0.3)
+    call(llm)
+    assert llm.breaker.state == "closed"
+
+
+def test_concurrent_calls_do_not_queue_or_trip_breaker(server):
+    # More concurrent callers than pool workers, with hedging active
+    server.config["latency"] = 0.5
+    llm = make_client(server, max_workers=4, hedge_min_samples=1, failure_threshold=3)
+    call(llm)
+
+    with ThreadPoolExecutor(max_workers=16) as callers:
+        futures = [callers.submit(call, llm, 0.9) for _ in range(16)]
+        results = [f.exception() for f in futures]
+
+    assert results == [None] * 16
+    stats = llm.get_stats()
+    assert stats["failures"] == 0
+    assert stats["circuit_state"] == "closed"
+
@@ -0,0 +1,111 @@
+"""
+Tests for prefetch.py.
+
+Run with: python -m pytest -q
+"""
+
+import threading
+import time
+
+import pytest
+
+import prefetch
+
+
+def fake_availability(medication_id):
+    return {"found": True, "medication_id": medication_id, "in_stock": True}
+
+
+def fake_profile(medication_id, id_number):
+    return {"found": True, "medication_id": medication_id, "id_number": id_number}
+
+
+@pytest.fixture(autouse=True)
+def fake_database(monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(prefetch, "get_medication_availability", fake_availability)
+    monkeypatch.setattr(prefetch, "get_medication_profile", fake_profile)
+    prefetch.reset_prefetch()
+    yield
+    prefetch.reset_prefetch()
+
+
+def wait_for_prefetches():
+    with prefetch._lock:
+        futures = [future for _, future in prefetch._entries.values()]
+    for future in futures:
+        future.result(timeout=5)
+
+
+def test_profile_is_only_served_to_the_user_it_was_fetched_for():
+    prefetch.schedule_followups(3, "111111111")
+    wait_for_prefetches()
+
+    assert prefetch.take("get_medication_profile", 3, "222222222") is None
+    assert prefetch.take("get_medication_profile", 3, None) is None
+    assert prefetch.take("get_medication_profile", 3, "111111111")["id_number"] == "111111111"
+
+
+def test_hits_misses_and_waste_are_counted():
+    prefetch.schedule_followups(1, "111111111")
+    wait_for_prefetches()
+
+    assert prefetch.take("get_medication_availability", 1) == fake_availability(1)
+    # Taken results are removed
+    assert prefetch.take("get_medication_availability", 1) is None
+
+    # Scheduling again replaces the unused profile
+    prefetch.schedule_followups(1, "111111111")
+
+    stats = prefetch.get_prefetch_stats()
+    assert stats["prefetched"] == 4
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["wasted"] == 1
+    assert stats["pending"] == 2
+
+
+def test_expired_results_are_not_served(monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_TTL_SECONDS", 0.05)
+    prefetch.schedule_followups(1, "111111111")
+    wait_for_prefetches()
+    time.sleep(0.1)
+
+    assert prefetch.take("get_medication_availability", 1) is None
+
+    stats = prefetch.get_prefetch_stats()
+    assert stats["wasted"] == 2
+    assert stats["misses"] == 1
+    assert stats["pending"] == 0
+
+
+def test_take_does_not_wait_for_unfinished_prefetch(monkeypatch):
+    release = threading.Event()
+
+    def slow_availability(medication_id):
+        release.wait(5)
+        return fake_availability(medication_id)
+
+    monkeypatch.setattr(prefetch, "get_medication_availability", slow_availability)
+    try:
+        for medication_id in range(1, 11):
+            prefetch.schedule_followups(medication_id, "111111111")
+
+        start = time.monotonic()
+        assert prefetch.take("get_medication_availability", 10) is None
+        assert time.monotonic() - start < 0.1
+
+        stats = prefetch.get_prefetch_stats()
+        assert stats["misses"] == 1
+        assert stats["wasted"] == 1
+    finally:
+        release.set()
+
+
+def test_database_errors_are_not_served(monkeypatch):
+    monkeypatch.setattr(prefetch, "get_medication_availability", lambda medication_id: {"error": "locked"})
+    prefetch.schedule_followups(1, "111111111")
+    wait_for_prefetches()
+
+    assert prefetch.take("get_medication_availability", 1) is None
+    assert prefetch.get_prefetch_stats()["misses"] == 1
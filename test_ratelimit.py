@@ -0,0 +1,133 @@
+"""
+Tests for ratelimit.py and the duplicate-submission handling in app.py.
+
+Run with: python -m pytest -q
+"""
+
+import threading
+import time
+
+from ratelimit import RateLimiter, SingleFlight
+
+APP_PATH = "app.py"
+USER = {"id_number": "123456789", "first_name": "David", "last_name": "Cohen"}
+
+
+def test_rate_limiter_allows_burst_then_rejects():
+    limiter = RateLimiter(per_minute=60, burst=2)
+
+    assert limiter.check("a")[0]
+    assert limiter.check("a")[0]
+    allowed, retry_after = limiter.check("a")
+    assert not allowed
+    assert 0 < retry_after <= 1.0
+
+    # Buckets are per user
+    assert limiter.check("b")[0]
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(single_flight.do("k", slow)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+
+
+def test_single_flight_reuses_completed_result_until_ttl():
+    single_flight = SingleFlight(result_ttl=0.2)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    # Sequential duplicate (a rerun after the first run finished)
+    assert single_flight.do("k", fn) == (1, False)
+    assert single_flight.do("k", fn) == (1, True)
+    assert len(calls) == 1
+
+    time.sleep(0.25)
+    assert single_flight.do("k", fn) == (2, False)
+
+
+def test_single_flight_does_not_keep_errors():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    try:
+        single_flight.do("k", fn)
+    except RuntimeError:
+        pass
+    assert single_flight.do("k", fn) == ("ok", False)
+
+
+def test_app_rerun_after_interrupted_processing_reuses_answer(monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    import agent
+
+    calls = []
+
+    def fake_run_agent(user_message, verified_user, conversation_history=[], llm=None):
+        calls.append(user_message)
+        history = conversation_history + [{"role": "user", "content": user_message}]
+        return f"answer to {user_message}", history, []
+
+    monkeypatch.setattr(agent, "run_agent", fake_run_agent)
+    monkeypatch.setattr(agent, "get_client", lambda: None)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.session_state["user"] = USER
+    at.run()
+
+    # Accept the message; the rerun it triggers runs the agent
+    at.chat_input[0].set_value("how much is Acamol?").run()
+    assert calls == ["how much is Acamol?"]
+    assert at.session_state["processing"] is False
+
+    # Replay the race: a rerun interrupted the processing run after run_agent
+    # returned but before the answer was stored, so the same submission runs again
+    submission_id = "interrupted-submission"
+    at.session_state["messages"] = at.session_state["messages"][:-1]
+    at.session_state["history"] = []
+    at.session_state["processing"] = True
+    at.session_state["current_input"] = "what about Advil?"
+    at.session_state["submission_id"] = submission_id
+    at.run()
+    assert calls == ["how much is Acamol?", "what about Advil?"]
+
+    at.session_state["messages"] = at.session_state["messages"][:-1]
+    at.session_state["history"] = []
+    at.session_state["processing"] = True
+    at.session_state["current_input"] = "what about Advil?"
+    at.session_state["submission_id"] = submission_id
+    at.run()
+
+    assert calls == ["how much is Acamol?", "what about Advil?"]
+    assert at.session_state["messages"][-1]["content"] == "answer to what about Advil?"
+    assert not at.exception
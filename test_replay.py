@@ -0,0 +1,127 @@
+"""
+Tests for recorder.py and replay.py.
+
+Run with: python -m pytest -q
+"""
+
+import glob
+import gzip
+import json
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+import agent
+import audit
+import catalog
+import init_db
+import recorder
+import replay
+import routing
+
+USER = {"id_number": "123456789", "first_name": "David", "last_name": "Cohen"}
+
+
+def completion(message):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": message}]
+    })
+
+
+def tool_call_message(call_id, name, arguments):
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": call_id, "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)}}]
+    }
+
+
+class ScriptedModel:
+    """Returns fixed responses in order (stands in for the OpenAI client while recording)."""
+
+    def __init__(self, messages):
+        self._messages = list(messages)
+
+    def create(self, deadline=None, **kwargs):
+        return completion(self._messages.pop(0))
+
+
+@pytest.fixture
+def pharmacy(tmp_path, monkeypatch, capsys):
+    """Seeded database and catalog snapshot in a scratch directory, recording on."""
+    monkeypatch.chdir(tmp_path)
+    init_db.init_database()
+    capsys.readouterr()
+
+    monkeypatch.setattr(audit, "AUDIT_ENABLED", False)
+    monkeypatch.setattr(routing, "ROUTING_MODE", "adaptive")
+    monkeypatch.setattr(recorder, "RECORD_DIR", str(tmp_path / "recordings"))
+    monkeypatch.setattr(recorder, "RECORD_SALT", "test-salt")
+    monkeypatch.setattr(catalog, "_name_index", None)
+    monkeypatch.setattr(catalog, "_load_attempted", False)
+    return tmp_path
+
+
+def record_sessions(directory):
+    return recorder.load_sessions(glob.glob(str(directory / "recordings" / "*.jsonl.gz")))
+
+
+def test_small_route_session_replays_without_divergences(pharmacy, monkeypatch):
+    # Record like the app does: snapshot loaded, lookup routed to the small model
+    catalog.load_snapshot()
+    agent.run_agent("how much is Acamol?", USER, [], llm=ScriptedModel([
+        tool_call_message("call_1", "medication_exists", {"medication_name": "Acamol"}),
+        tool_call_message("call_2", "get_medication_availability", {"medication_id": 1}),
+        {"role": "assistant", "content": "Acamol costs 25.90"}
+    ]))
+    sessions = record_sessions(pharmacy)
+    assert [call["model"] for call in sessions[0]["model_calls"]] == [routing.MODELS["small"]] * 3
+
+    # Replay in a fresh process state: nothing has loaded the snapshot
+    monkeypatch.setattr(catalog, "_name_index", None)
+    monkeypatch.setattr(catalog, "_load_attempted", False)
+    report = replay.run_replay(sessions)
+
+    assert report["divergences"] == []
+
+
+def test_replay_reports_changed_tool_result(pharmacy):
+    catalog.load_snapshot()
+    agent.run_agent("how much is Acamol?", USER, [], llm=ScriptedModel([
+        tool_call_message("call_1", "get_medication_availability", {"medication_id": 1}),
+        {"role": "assistant", "content": "Acamol costs 25.90"}
+    ]))
+    sessions = record_sessions(pharmacy)
+    sessions[0]["tool_calls"][0]["content"] = "{}"
+
+    report = replay.run_replay(sessions)
+
+    assert [d["field"] for d in report["divergences"]] == ["content (get_medication_availability)"]
+
+
+def test_recording_redacts_user(pharmacy):
+    agent.run_agent("my ID is 123456789, what is the dosage of Augmentin?", USER, [], llm=ScriptedModel([
+        tool_call_message("call_1", "get_medication_profile", {"medication_id": 3}),
+        {"role": "assistant", "content": "David Cohen, take it with food."}
+    ]))
+
+    path = glob.glob(str(pharmacy / "recordings" / "*.jsonl.gz"))[0]
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        raw = f.read()
+
+    for identifier in USER.values():
+        assert identifier not in raw
+    session = json.loads(raw)
+    assert session["verified_user"] == {"id_hash": recorder.hash_id_number(USER["id_number"])}
+    assert "content" not in session["tool_calls"][0]
+
+
+def test_no_recording_without_salt(pharmacy, monkeypatch):
+    monkeypatch.setattr(recorder, "RECORD_SALT", "")
+
+    assert recorder.start_session("hi", USER, []) is None
@@ -0,0 +1,47 @@
+"""
+Tests for routing.py.
+
+Run with: python -m pytest -q
+"""
+
+import json
+
+import pytest
+
+import catalog
+import routing
+
+MEDICATIONS = [
+    {"id": 1, "name_english": "Acamol", "name_hebrew": "אקמול"},
+    {"id": 4, "name_english": "Advil", "name_hebrew": "אדוויל"}
+]
+
+
+@pytest.fixture
+def unloaded_catalog(tmp_path, monkeypatch):
+    """A snapshot on disk that nothing has loaded yet."""
+    path = tmp_path / "catalog_snapshot.json"
+    path.write_text(json.dumps({"medications": MEDICATIONS}, ensure_ascii=False), encoding="utf-8")
+
+    monkeypatch.setattr(catalog, "SNAPSHOT_PATH", str(path))
+    monkeypatch.setattr(catalog, "_name_index", None)
+    monkeypatch.setattr(catalog, "_load_attempted", False)
+    monkeypatch.setattr(routing, "ROUTING_MODE", "adaptive")
+    return path
+
+
+def test_routing_loads_snapshot_on_first_use(unloaded_catalog):
+    assert routing.classify_user_message("how much is Acamol?") == ("small", "price/stock lookup")
+
+
+def test_missing_snapshot_routes_lookups_to_large(unloaded_catalog, monkeypatch):
+    monkeypatch.setattr(catalog, "SNAPSHOT_PATH", str(unloaded_catalog) + ".missing")
+
+    assert routing.classify_user_message("how much is Acamol?")[0] == "large"
+
+
+def test_evaluation_cases(unloaded_catalog):
+    evaluation = routing.evaluate_offline()
+
+    failed = [r for r in evaluation["results"] if not r["correct"]]
+    assert failed == []
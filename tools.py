@@ -9,7 +9,7 @@ tools = [
         "type": "function",
         "function": {
             "name": "medication_exists",
-            "description": "Check if a medication exists in the pharmacy database by searching its name in English or Hebrew. Returns the medication details including its ID if found.",
+            "description": "Check if a medication exists in the pharmacy database by searching its name in English or Hebrew. Returns the medication details including its ID if found, or 'found': false otherwise.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -28,13 +28,18 @@ tools = [
         "type": "function",
         "function": {
             "name": "get_medication_availability",
-            "description": "Get the availability and price of a medication using its database ID. Use this AFTER calling medication_exists to get the ID. Returns: 'found' (bool), 'in_stock' (bool), 'stock_quantity' (int), and 'price' (float in Israeli Shekels ₪). Does NOT return medication ID or names - the agent already has this information from medication_exists.",
+            "description": "Get the availability and price of a medication using its database ID. Use this AFTER calling medication_exists to get the ID. Returns: 'in_stock' (bool), 'stock_quantity' (int), and 'price' (float in Israeli Shekels ₪), or 'found': false if the ID is unknown. Does NOT return medication ID or names - the agent already has this information from medication_exists.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "medication_id": {
                         "type": "integer",
                         "description": "The unique database ID of the medication (obtained from medication_exists function)."
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["in_stock", "stock_quantity", "price"]},
+                        "description": "Optional. Only return these fields (e.g. [\"price\"] for a price question). Omit to get all fields."
                     }
                 },
                 "required": ["medication_id"]
@@ -47,7 +52,60 @@ tools = [
         "type": "function",
         "function": {
             "name": "get_medication_profile",
-            "description": "Get detailed medical information from the medication leaflet using its database ID. Use this AFTER calling medication_exists to get the ID. Returns: 'found' (bool), 'requires_prescription' (bool), 'can_access' (bool), and if accessible: 'active_ingredients', 'dosage_instructions', 'usage_instructions', 'factual_info'. For prescription medications, automatically checks user's prescription status.",
+            "description": "Get detailed medical information from the medication leaflet using its database ID. Use this AFTER calling medication_exists to get the ID. Returns: 'requires_prescription' (bool), 'can_access' (bool), and if accessible: 'active_ingredients', 'dosage_instructions', 'usage_instructions', 'factual_info'. For prescription medications, automatically checks user's prescription status.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "medication_id": {
+                        "type": "integer",
+                        "description": "The unique database ID of the medication (obtained from medication_exists function)."
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["active_ingredients", "dosage_instructions", "usage_instructions", "factual_info"]},
+                        "description": "Optional. Only return these fields (e.g. [\"dosage_instructions\"] for a dosage question). Omit to get all fields."
+                    }
+                },
+                "required": ["medication_id"]
+            }
+        }
+    },
+
+    # Tool 4: Get in-stock branches for a medication
+    {
+        "type": "function",
+        "function": {
+            "name": "get_branch_availability",
+            "description": "Find which branches of the chain have a medication in stock, using its database ID. Use this AFTER calling medication_exists to get the ID, when the user asks which branch/store has a medication. If a branch name or city is given, branches are ranked by distance from it (nearest first, 'distance_km'); otherwise by quantity. Returns 'branches' (list with 'name_english', 'name_hebrew', 'city', 'quantity', 'distance_km') and 'reference_branch'. An empty list means no branch has it in stock.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "medication_id": {
+                        "type": "integer",
+                        "description": "The unique database ID of the medication (obtained from medication_exists function)."
+                    },
+                    "branch_name": {
+                        "type": "string",
+                        "description": "Optional. Branch name or city to rank by distance from, in English (e.g., 'Tel Aviv') or Hebrew (e.g., 'תל אביב')."
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 20,
+                        "description": "Optional. Maximum number of branches to return, 1-20 (default 5)."
+                    }
+                },
+                "required": ["medication_id"]
+            }
+        }
+    },
+
+    # Tool 5: Find same-ingredient alternatives
+    {
+        "type": "function",
+        "function": {
+            "name": "find_equivalent_medications",
+            "description": "Find in-stock medications with exactly the same active ingredients and strengths (e.g. Advil and Nurofen are both Ibuprofen 400mg). Use this AFTER calling medication_exists to get the ID, when a medication is out of stock or the user asks for an equivalent. Returns 'alternatives' (list with 'name_english', 'name_hebrew', 'price', 'stock_quantity', 'requires_prescription'), cheapest first. An empty list means no in-stock equivalent. Does NOT return leaflet information.",
             "parameters": {
                 "type": "object",
                 "properties": {